@@ -24,7 +24,7 @@ def create_app() -> Flask:
         resources={r"/api/*": {"origins": ["http://localhost:4200", "http://127.0.0.1:4200"]}},
         supports_credentials=True,
         expose_headers=["Authorization", "Content-Type"],
-        allow_headers=["Authorization", "Content-Type"],
+        allow_headers=["Authorization", "Content-Type", "Idempotency-Key"],
         methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     )
 
@@ -42,11 +42,13 @@ def create_app() -> Flask:
     from src.routes.employees import employees_bp
     from src.routes.timesheets import timesheets_bp
     from src.routes.payslips import payslips_bp
+    from src.routes.jobs import jobs_bp
 
     app.register_blueprint(auth_bp,        url_prefix="/api/auth")
     app.register_blueprint(employees_bp,   url_prefix="/api/employees")
     app.register_blueprint(timesheets_bp,  url_prefix="/api/timesheets")
     app.register_blueprint(payslips_bp,    url_prefix="/api/payslips")
+    app.register_blueprint(jobs_bp,        url_prefix="/api/jobs")
 
     # Debug helper to see routes from the browser
     @app.get("/api/debug/routes")
@@ -1,6 +1,11 @@
 # db.py
 import os
+import threading
+import time
+from collections import OrderedDict
 from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
 from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
 
 import psycopg2
@@ -56,17 +61,162 @@ def get_database_url() -> str:
         raise RuntimeError("DATABASE_URL is not set. Add it to .env")
     return _append_sslmode_if_local(url)
 
+# ------------------------
+# Read replicas
+# ------------------------
+# DATABASE_REPLICA_URLS is an optional comma-separated list of replica DSNs.
+# Handlers marked @read_only go round-robin across them, one replica per
+# request so a response never mixes data with different lag. A replica that
+# fails to connect within REPLICA_CONNECT_TIMEOUT is skipped for
+# REPLICA_RETRY_SECONDS, and if none are usable the read falls back to the
+# primary. After a user writes, their reads stay on the primary for
+# READ_YOUR_WRITES_SECONDS so they never see stale data.
+#
+# Read-your-writes state is kept per process (bounded to STICKY_MAX_USERS
+# entries). With several web processes behind a load balancer, a user's next
+# read may land on a process that didn't see the write; run one process per
+# user session (sticky sessions) or keep READ_YOUR_WRITES_SECONDS above the
+# replicas' typical lag if that matters.
+REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("DB_REPLICA_CONNECT_TIMEOUT", "2"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+STICKY_MAX_USERS = int(os.getenv("DB_STICKY_MAX_USERS", "10000"))
+
+_lock = threading.Lock()
+_rr_index = 0
+_replica_down_until = {}          # dsn -> monotonic time it may be retried
+_last_write_at = OrderedDict()    # sticky key (user id) -> monotonic time of last write, oldest first
+
+# per-request replica choice inside @read_only: None outside, {} until the
+# first read picks, then {"dsn": replica dsn or None for the primary}
+_route = ContextVar("db_route", default=None)
+_sticky_key = ContextVar("db_sticky_key", default=None)
+
+def get_replica_urls() -> list:
+    raw = os.getenv("DATABASE_REPLICA_URLS", "")
+    return [_append_sslmode_if_local(u.strip()) for u in raw.split(",") if u.strip()]
+
+def set_sticky_key(key):
+    """
+    Tag the current request with a user id for read-your-writes.
+    Returns a token for reset_sticky_key().
+    """
+    return _sticky_key.set(key)
+
+def reset_sticky_key(token):
+    _sticky_key.reset(token)
+
+def read_only(fn):
+    """Route every db read inside the wrapped handler to the same replica."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _route.set({})
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _route.reset(token)
+    return wrapper
+
+def note_write():
+    """
+    Keep the current user's reads on the primary for READ_YOUR_WRITES_SECONDS.
+    execute()/executemany() call this; code that writes through get_conn()
+    directly calls it after the transaction commits.
+    """
+    key = _sticky_key.get()
+    if key is None:
+        return
+    now = time.monotonic()
+    with _lock:
+        _last_write_at[key] = now
+        _last_write_at.move_to_end(key)
+        # oldest first: drop expired entries and anything over the cap
+        while _last_write_at:
+            oldest_key, ts = next(iter(_last_write_at.items()))
+            if now - ts < READ_YOUR_WRITES_SECONDS and len(_last_write_at) <= STICKY_MAX_USERS:
+                break
+            del _last_write_at[oldest_key]
+
+def _recently_wrote() -> bool:
+    key = _sticky_key.get()
+    if key is None:
+        return False
+    with _lock:
+        ts = _last_write_at.get(key)
+        if ts is None:
+            return False
+        if time.monotonic() - ts < READ_YOUR_WRITES_SECONDS:
+            return True
+        del _last_write_at[key]
+        return False
+
+def _replica_candidates(replicas: list) -> list:
+    """Healthy replicas in round-robin order, starting from the next one."""
+    global _rr_index
+    now = time.monotonic()
+    with _lock:
+        start = _rr_index % len(replicas)
+        _rr_index += 1
+        ordered = replicas[start:] + replicas[:start]
+        return [dsn for dsn in ordered if _replica_down_until.get(dsn, 0) <= now]
+
+def _try_replica(dsn: str):
+    """Connects to one replica, marking it down for REPLICA_RETRY_SECONDS on failure."""
+    try:
+        conn = psycopg2.connect(dsn, cursor_factory=RealDictCursor, connect_timeout=REPLICA_CONNECT_TIMEOUT)
+    except psycopg2.OperationalError:
+        with _lock:
+            _replica_down_until[dsn] = time.monotonic() + REPLICA_RETRY_SECONDS
+        return None
+    with _lock:
+        _replica_down_until.pop(dsn, None)
+    return conn
+
+def _pick_replica():
+    """Returns (conn, dsn) for the next healthy replica, or (None, None) to use the primary."""
+    replicas = get_replica_urls()
+    if not replicas or _recently_wrote():
+        return None, None
+    for dsn in _replica_candidates(replicas):
+        conn = _try_replica(dsn)
+        if conn is not None:
+            return conn, dsn
+    return None, None
+
+def _connect_replica():
+    """
+    Returns a replica connection, or None to use the primary. Inside a
+    @read_only handler the first read picks the replica and later reads
+    reuse it; if it goes away mid-request the rest of the request reads
+    from the primary rather than from a replica with different lag.
+    """
+    route = _route.get()
+    if route is None:
+        return _pick_replica()[0]
+    if "dsn" in route:
+        if route["dsn"] is None:
+            return None
+        conn = _try_replica(route["dsn"])
+        if conn is None:
+            route["dsn"] = None
+        return conn
+    conn, route["dsn"] = _pick_replica()
+    return conn
+
 @contextmanager
-def get_conn():
+def get_conn(readonly: bool = False):
     """
     Usage:
         with get_conn() as conn:
             with conn.cursor() as cur:
                 cur.execute("select 1;")
                 print(cur.fetchone())
+
+    readonly=True tries a replica first (see DATABASE_REPLICA_URLS).
     """
-    dsn = get_database_url()
-    conn = psycopg2.connect(dsn, cursor_factory=RealDictCursor)
+    conn = _connect_replica() if readonly else None
+    if conn is None:
+        conn = psycopg2.connect(get_database_url(), cursor_factory=RealDictCursor)
     try:
         yield conn
         conn.commit()
@@ -76,14 +226,18 @@ def get_conn():
     finally:
         conn.close()
 
-def fetch_one(query: str, params=None):
-    with get_conn() as conn:
+def fetch_one(query: str, params=None, readonly=None):
+    if readonly is None:
+        readonly = _route.get() is not None
+    with get_conn(readonly=readonly) as conn:
         with conn.cursor() as cur:
             cur.execute(query, params or ())
             return cur.fetchone()
 
-def fetch_all(query: str, params=None):
-    with get_conn() as conn:
+def fetch_all(query: str, params=None, readonly=None):
+    if readonly is None:
+        readonly = _route.get() is not None
+    with get_conn(readonly=readonly) as conn:
         with conn.cursor() as cur:
             cur.execute(query, params or ())
             return cur.fetchall()
@@ -92,18 +246,15 @@ def execute(query: str, params=None):
     with get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(query, params or ())
+    note_write()
 
 def executemany(query: str, seq_of_params):
     with get_conn() as conn:
         with conn.cursor() as cur:
             cur.executemany(query, seq_of_params)
+    note_write()
 
-def ensure_schema():
-    """
-    Creates minimal tables if they don't exist yet.
-    Safe to run multiple times.
-    """
-    ddl = """
+SCHEMA_DDL = """
     CREATE TABLE IF NOT EXISTS users (
         id SERIAL PRIMARY KEY,
         email TEXT UNIQUE NOT NULL,
@@ -118,6 +269,9 @@ def ensure_schema():
         full_name TEXT NOT NULL,
         rate NUMERIC(10,2) NOT NULL DEFAULT 0
     );
+    ALTER TABLE employees ADD COLUMN IF NOT EXISTS email TEXT UNIQUE;
+    -- legacy display name (sql/schema.sql); routes read COALESCE(full_name, name)
+    ALTER TABLE employees ADD COLUMN IF NOT EXISTS name TEXT;
 
     CREATE TABLE IF NOT EXISTS timesheets (
         id SERIAL PRIMARY KEY,
@@ -126,8 +280,61 @@ def ensure_schema():
         hours NUMERIC(5,2) NOT NULL DEFAULT 0,
         status TEXT NOT NULL DEFAULT 'pending'
     );
+
+    CREATE TABLE IF NOT EXISTS payslips (
+        id SERIAL PRIMARY KEY,
+        employee_id INTEGER REFERENCES employees(id) ON DELETE CASCADE,
+        period_start DATE NOT NULL,
+        period_end DATE NOT NULL,
+        gross NUMERIC(12,2) NOT NULL DEFAULT 0,
+        net NUMERIC(12,2) NOT NULL DEFAULT 0
+    );
+
+    -- lookups the routes do per request (checked by query_plans.py)
+    CREATE INDEX IF NOT EXISTS users_email_lower_idx ON users (lower(email));
+    CREATE INDEX IF NOT EXISTS employees_email_lower_idx ON employees (lower(email));
+    CREATE INDEX IF NOT EXISTS timesheets_employee_week_idx ON timesheets (employee_id, week_start DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS payslips_employee_period_idx ON payslips (employee_id, period_end, id);
+
+    -- stored responses for retried POST/PATCH requests (Idempotency-Key header)
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        user_id INTEGER NOT NULL,
+        key TEXT NOT NULL,
+        request_hash TEXT NOT NULL,
+        status_code INTEGER,
+        response JSONB,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (user_id, key)
+    );
+
+    -- background job queue (see jobs.py / worker.py)
+    CREATE TABLE IF NOT EXISTS jobs (
+        id BIGSERIAL PRIMARY KEY,
+        job_type TEXT NOT NULL,
+        payload JSONB NOT NULL DEFAULT '{}',
+        status TEXT NOT NULL DEFAULT 'queued',   -- queued | running | done | failed
+        progress INTEGER NOT NULL DEFAULT 0,     -- 0..100
+        result JSONB,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 5,
+        run_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        locked_by TEXT,
+        heartbeat_at TIMESTAMPTZ,
+        created_by INTEGER,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    CREATE INDEX IF NOT EXISTS jobs_queued_idx ON jobs (run_at, id) WHERE status = 'queued';
+    CREATE INDEX IF NOT EXISTS jobs_running_idx ON jobs (job_type) WHERE status = 'running';
+"""
+
+def ensure_schema():
+    """
+    Creates minimal tables if they don't exist yet.
+    Safe to run multiple times.
     """
-    execute(ddl)
+    execute(SCHEMA_DDL)
 
 if __name__ == "__main__":
     # quick connectivity + schema check you can run: python db.py
@@ -136,7 +343,7 @@ if __name__ == "__main__":
         one = fetch_one("select current_user as user, current_database() as db;")
         print(f"Connected as {one['user']} to {one['db']}")
         ensure_schema()
-        print("Schema OK (users, employees, timesheets).")
+        print("Schema OK (users, employees, timesheets, payslips, idempotency_keys, jobs).")
     except Exception as e:
         print("DB check failed:", repr(e))
         raise
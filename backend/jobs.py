@@ -0,0 +1,327 @@
+# jobs.py — Postgres-backed background job queue
+#
+# The API enqueues a row in `jobs` and returns straight away; `python worker.py`
+# processes claim rows with SELECT ... FOR UPDATE SKIP LOCKED, so throughput
+# scales by starting more worker processes.
+#
+# Usage:
+#     @register("payslips.render", concurrency=2)
+#     def render(payload, progress):
+#         ...
+#         progress(done, total)
+#         return {"rendered": done}      # stored as jobs.result
+#
+#     job_id = enqueue("payslips.render", {"ids": [1, 2, 3]}, created_by=uid)
+#
+# While a handler runs, a background thread refreshes the job's heartbeat;
+# every update a worker makes to a job it claimed is guarded by
+# locked_by = <worker id>, so a worker whose job was requeued as stale can't
+# overwrite the new owner's outcome.
+import os
+import socket
+import threading
+import time
+import traceback
+
+from psycopg2.extras import Json
+
+from db import get_conn, fetch_one, note_write
+from queries import named_query
+
+RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+# a running job whose worker hasn't reported in this long is put back in the queue
+# (or failed, if it has no attempts left)
+STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "600"))
+HEARTBEAT_SECONDS = STALE_SECONDS / 4
+
+_handlers = {}      # job_type -> handler(payload, progress) -> result
+_concurrency = {}   # job_type -> max jobs of that type running at once (None = no limit)
+_validators = {}    # job_type -> validate(payload), raises ValueError; runs at enqueue time
+
+class JobError(Exception):
+    """Raise from a handler to fail the job without retrying."""
+
+def register(job_type: str, concurrency: int = None, max_attempts: int = 5, validate=None):
+    """
+    validate(payload) is called by enqueue() and raises ValueError to reject
+    the payload before it is stored.
+    """
+    def deco(fn):
+        _handlers[job_type] = fn
+        _concurrency[job_type] = concurrency
+        _validators[job_type] = validate
+        fn.max_attempts = max_attempts
+        return fn
+    return deco
+
+def job_types() -> list:
+    return sorted(_handlers)
+
+ENQUEUE_SQL = named_query(
+    "jobs.enqueue",
+    """
+    INSERT INTO jobs (job_type, payload, max_attempts, created_by, run_at)
+    VALUES (%s, %s, %s, %s, now() + make_interval(secs => %s))
+    RETURNING id
+    """,
+    params=("payslips.render", "{}", 5, 1, 0),
+)
+GET_JOB_SQL = named_query(
+    "jobs.get",
+    """
+    SELECT id, job_type, status, progress, result, error, attempts, max_attempts,
+           created_by, run_at, created_at, updated_at
+    FROM jobs
+    WHERE id = %s
+    """,
+    params=(42,),
+)
+FAIL_STALE_SQL = named_query(
+    "jobs.fail_stale",
+    """
+    UPDATE jobs
+       SET status = 'failed', error = 'worker stopped responding', payload = '{}',
+           locked_by = NULL, updated_at = now()
+     WHERE status = 'running'
+       AND heartbeat_at < now() - make_interval(secs => %s)
+       AND attempts >= max_attempts
+    """,
+    params=(600,),
+)
+REQUEUE_STALE_SQL = named_query(
+    "jobs.requeue_stale",
+    """
+    UPDATE jobs
+       SET status = 'queued', locked_by = NULL, updated_at = now()
+     WHERE status = 'running'
+       AND heartbeat_at < now() - make_interval(secs => %s)
+       AND attempts < max_attempts
+    """,
+    params=(600,),
+)
+NEXT_JOB_SQL = named_query(
+    "jobs.claim_next",
+    """
+    SELECT id, job_type
+    FROM jobs
+    WHERE status = 'queued' AND run_at <= now() AND job_type = ANY(%s)
+    ORDER BY run_at, id
+    FOR UPDATE SKIP LOCKED
+    LIMIT 1
+    """,
+    params=(["payslips.render", "employees.import"],),
+)
+TYPE_LOCK_SQL = named_query(
+    "jobs.type_lock", "SELECT pg_advisory_xact_lock(hashtext(%s))", params=("jobs:payslips.render",),
+)
+RUNNING_COUNT_SQL = named_query(
+    "jobs.running_count",
+    "SELECT count(*) AS n FROM jobs WHERE status = 'running' AND job_type = %s",
+    params=("payslips.render",),
+)
+MARK_RUNNING_SQL = named_query(
+    "jobs.mark_running",
+    """
+    UPDATE jobs
+       SET status = 'running', attempts = attempts + 1, locked_by = %s,
+           heartbeat_at = now(), updated_at = now(), error = NULL
+     WHERE id = %s
+    RETURNING id, job_type, payload, attempts, max_attempts
+    """,
+    params=("bench:1", 42),
+)
+HEARTBEAT_SQL = named_query(
+    "jobs.heartbeat",
+    "UPDATE jobs SET heartbeat_at = now() WHERE id = %s AND locked_by = %s",
+    params=(42, "bench:1"),
+)
+PROGRESS_SQL = named_query(
+    "jobs.progress",
+    """
+    UPDATE jobs SET progress = %s, heartbeat_at = now(), updated_at = now()
+     WHERE id = %s AND locked_by = %s
+    """,
+    params=(50, 42, "bench:1"),
+)
+# payloads can hold bulk imports; finished jobs don't keep them
+FAIL_SQL = named_query(
+    "jobs.fail",
+    """
+    UPDATE jobs
+       SET status = 'failed', error = %s, payload = '{}', locked_by = NULL, updated_at = now()
+     WHERE id = %s AND locked_by = %s
+    """,
+    params=("boom", 42, "bench:1"),
+)
+RETRY_SQL = named_query(
+    "jobs.retry",
+    """
+    UPDATE jobs
+       SET status = 'queued', error = %s, locked_by = NULL, updated_at = now(),
+           run_at = now() + make_interval(secs => %s)
+     WHERE id = %s AND locked_by = %s
+    """,
+    params=("boom", 10, 42, "bench:1"),
+)
+DONE_SQL = named_query(
+    "jobs.done",
+    """
+    UPDATE jobs
+       SET status = 'done', progress = 100, result = %s, payload = '{}',
+           locked_by = NULL, updated_at = now()
+     WHERE id = %s AND locked_by = %s
+    """,
+    params=("{}", 42, "bench:1"),
+)
+
+def enqueue(job_type: str, payload: dict = None, created_by: int = None, delay_seconds: float = 0) -> int:
+    """Stores a job; raises ValueError for an unknown type or a payload its validator rejects."""
+    if job_type not in _handlers:
+        raise ValueError(f"unknown job type: {job_type}")
+    if _validators[job_type]:
+        _validators[job_type](payload or {})
+    row = fetch_one(
+        ENQUEUE_SQL,
+        (job_type, Json(payload or {}), _handlers[job_type].max_attempts, created_by, delay_seconds),
+        readonly=False,
+    )
+    note_write()
+    return row["id"]
+
+def get_job(job_id: int):
+    # status polls must see the worker's latest update
+    return fetch_one(GET_JOB_SQL, (job_id,), readonly=False)
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff: base, 2*base, 4*base, ... capped at RETRY_MAX_SECONDS."""
+    return min(RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), RETRY_MAX_SECONDS)
+
+def requeue_stale():
+    """
+    Puts running jobs whose worker stopped heartbeating back in the queue,
+    or fails them if they have used up their attempts.
+    Returns (requeued, failed).
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(FAIL_STALE_SQL, (STALE_SECONDS,))
+            failed = cur.rowcount
+            cur.execute(REQUEUE_STALE_SQL, (STALE_SECONDS,))
+            return cur.rowcount, failed
+
+def _claim_from(cur, worker_id: str, types: list):
+    """
+    Returns (job, None) on success, (None, job_type) if the next due job's
+    type is at its concurrency limit, or (None, None) if nothing is due.
+    """
+    cur.execute(NEXT_JOB_SQL, (types,))
+    job = cur.fetchone()
+    if not job:
+        return None, None
+
+    limit = _concurrency.get(job["job_type"])
+    if limit is not None:
+        cur.execute(TYPE_LOCK_SQL, ("jobs:" + job["job_type"],))
+        cur.execute(RUNNING_COUNT_SQL, (job["job_type"],))
+        if cur.fetchone()["n"] >= limit:
+            return None, job["job_type"]
+
+    cur.execute(MARK_RUNNING_SQL, (worker_id, job["id"]))
+    return cur.fetchone(), None
+
+def claim(worker_id: str, types: list = None):
+    """
+    Takes the next due job of one of `types` (default: all registered) and
+    marks it running. Returns the job row, or None if nothing is claimable.
+    Per-type concurrency is enforced under a transaction-scoped advisory
+    lock on the type, so two workers can't both take the last free slot;
+    types at their limit are skipped for this call.
+    """
+    types = [t for t in (types or job_types()) if t in _handlers]
+    while types:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                job, saturated = _claim_from(cur, worker_id, types)
+        if job or not saturated:
+            return job
+        types.remove(saturated)
+    return None
+
+def _progress_reporter(job_id: int, worker_id: str):
+    """progress(done, total) -> stores a 0..100 percentage and refreshes the heartbeat."""
+    def progress(done, total=100):
+        pct = int(100 * done / total) if total else 100
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(PROGRESS_SQL, (max(0, min(pct, 100)), job_id, worker_id))
+    return progress
+
+def _heartbeat(job_id: int, worker_id: str, stopped: threading.Event):
+    """Refreshes heartbeat_at every HEARTBEAT_SECONDS until `stopped` is set."""
+    while not stopped.wait(HEARTBEAT_SECONDS):
+        try:
+            with get_conn() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(HEARTBEAT_SQL, (job_id, worker_id))
+        except Exception as e:
+            print(f"[{worker_id}] job {job_id}: heartbeat failed: {e}", flush=True)
+
+def _finish(job_id: int, worker_id: str, sql: str, params: tuple) -> bool:
+    """Records the outcome; False if the job was taken over by another worker meanwhile."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params + (job_id, worker_id))
+            return cur.rowcount == 1
+
+def run(job, worker_id: str) -> str:
+    """
+    Runs a job claimed by `worker_id` and records the outcome. Returns the
+    new status, or "lost" if the job was requeued as stale while it ran.
+    """
+    handler = _handlers[job["job_type"]]
+    stopped = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(job["id"], worker_id, stopped), daemon=True)
+    beat.start()
+    try:
+        try:
+            result = handler(job["payload"] or {}, _progress_reporter(job["id"], worker_id))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if isinstance(e, JobError) or job["attempts"] >= job["max_attempts"]:
+                status, sql, params = "failed", FAIL_SQL, (error,)
+            else:
+                status, sql, params = "queued", RETRY_SQL, (error, backoff_seconds(job["attempts"]))
+        else:
+            status, sql, params = "done", DONE_SQL, (Json(result),)
+    finally:
+        stopped.set()
+        beat.join()
+    return status if _finish(job["id"], worker_id, sql, params) else "lost"
+
+def work(types: list = None, poll_seconds: float = 1.0, stop=None):
+    """
+    Worker loop for one process: claim, run, repeat; sleeps when idle.
+    `stop` is an optional callable returning True to exit between jobs.
+    Database errors are printed and retried after `poll_seconds`; a job whose
+    outcome couldn't be recorded is requeued once its heartbeat goes stale.
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    last_reap = 0.0
+    while not (stop and stop()):
+        job = None
+        try:
+            if time.monotonic() - last_reap > STALE_SECONDS / 2:
+                requeue_stale()
+                last_reap = time.monotonic()
+            job = claim(worker_id, types)
+            if job is None:
+                time.sleep(poll_seconds)
+                continue
+            status = run(job, worker_id)
+            print(f"[{worker_id}] job {job['id']} ({job['job_type']}) -> {status}", flush=True)
+        except Exception:
+            where = f"job {job['id']} ({job['job_type']})" if job else "queue"
+            print(f"[{worker_id}] {where}: error, retrying in {poll_seconds}s", flush=True)
+            traceback.print_exc()
+            time.sleep(poll_seconds)
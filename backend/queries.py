@@ -0,0 +1,50 @@
+# queries.py — registry of the named SQL statements the app issues
+#
+# Route and worker modules declare their SQL through named_query() so the
+# plan checker (python query_plans.py) can EXPLAIN every statement against a
+# large seeded dataset:
+#
+#     LOGIN_USER_SQL = named_query(
+#         "auth.login_user",
+#         "SELECT ... FROM users WHERE lower(email) = lower(%s)",
+#         params=("user42@bench.local",),   # sample values valid in the seeded data
+#     )
+#     row = fetch_one(LOGIN_USER_SQL, (ident,))
+#
+# Budgets default to a single-row lookup and are sized for the dataset
+# query_plans.py seeds by default. Statements that deliberately read a whole
+# table (e.g. listing every employee) name that table in seq_scan_ok and
+# raise their budgets.
+DEFAULT_MAX_MS = 50.0
+DEFAULT_MAX_BUFFERS = 1000
+
+QUERIES = {}  # name -> {name, sql, params, seq_scan_ok, max_ms, max_buffers}
+
+def named_query(name: str, sql: str, params=(), seq_scan_ok=(),
+                max_ms=DEFAULT_MAX_MS, max_buffers=DEFAULT_MAX_BUFFERS) -> str:
+    """
+    Registers `sql` under `name` and returns it unchanged.
+    params: sample parameters for EXPLAIN (match the data query_plans.py seeds).
+    max_ms / max_buffers: None disables that budget.
+    """
+    if name in QUERIES and QUERIES[name]["sql"] != sql:
+        raise ValueError(f"query name registered twice: {name}")
+    QUERIES[name] = {
+        "name": name,
+        "sql": sql,
+        "params": params,
+        "seq_scan_ok": tuple(seq_scan_ok),
+        "max_ms": max_ms,
+        "max_buffers": max_buffers,
+    }
+    return sql
+
+def load_all() -> dict:
+    """Imports every module that issues SQL so the registry is complete."""
+    import src.routes.auth          # noqa: F401
+    import src.routes.employees     # noqa: F401
+    import src.routes.timesheets    # noqa: F401
+    import src.routes.payslips      # noqa: F401
+    import jobs                     # noqa: F401
+    import tasks                    # noqa: F401
+    return QUERIES
@@ -0,0 +1,212 @@
+# query_plans.py — EXPLAIN every registered query against a large seeded dataset
+#
+#   PLAN_CHECK_DATABASE_URL=postgresql://... python query_plans.py
+#   python query_plans.py --dsn postgresql://... --employees 50000 --json plans.json
+#
+# Seeds an isolated `plan_check` schema (dropped and recreated each run unless
+# --reuse), runs EXPLAIN (ANALYZE, BUFFERS) on each query in queries.QUERIES
+# inside a rolled-back transaction, and exits 1 if any query
+#   - does a Seq Scan on a table with >= --large-rows rows (unless listed in seq_scan_ok)
+#   - exceeds its max_ms execution-time budget
+#   - exceeds its max_buffers budget (shared hit + read)
+#   - fails to run
+# Point it at a scratch database, not production: seeding writes ~1M rows.
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+# Ensure backend root (where db.py lives) is importable
+ROOT = Path(__file__).resolve().parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from db import SCHEMA_DDL  # noqa: E402
+from queries import load_all  # noqa: E402
+
+SCHEMA = "plan_check"
+
+SEED_SQL = [
+    """
+    INSERT INTO users (email, password_hash, role)
+    SELECT 'user' || g || '@bench.local', 'x', 'employee'
+    FROM generate_series(1, %(employees)s) g
+    """,
+    """
+    INSERT INTO employees (user_id, full_name, email, rate)
+    SELECT id, 'Employee ' || id, email, 20 + id %% 15
+    FROM users
+    ORDER BY id
+    """,
+    """
+    INSERT INTO timesheets (employee_id, week_start, hours, status)
+    SELECT e.id, date '2024-01-01' + 7 * w, 30 + (e.id + w) %% 10,
+           CASE WHEN (e.id + w) %% 3 = 0 THEN 'approved' ELSE 'pending' END
+    FROM employees e CROSS JOIN generate_series(0, %(weeks)s - 1) w
+    """,
+    """
+    INSERT INTO payslips (employee_id, period_start, period_end, gross, net)
+    SELECT e.id,
+           (date '2024-01-01' + make_interval(months => m))::date,
+           (date '2024-01-01' + make_interval(months => m + 1) - interval '1 day')::date,
+           4000, 3100
+    FROM employees e CROSS JOIN generate_series(0, %(months)s - 1) m
+    """,
+    """
+    INSERT INTO jobs (job_type, payload, status, progress, attempts, created_by,
+                      run_at, heartbeat_at, created_at, updated_at)
+    SELECT CASE WHEN g %% 2 = 0 THEN 'payslips.render' ELSE 'employees.import' END,
+           '{}',
+           CASE WHEN g %% 100 = 0 THEN 'queued' WHEN g %% 500 = 1 THEN 'running' ELSE 'done' END,
+           CASE WHEN g %% 100 = 0 THEN 0 ELSE 100 END,
+           1, 1,
+           now() - make_interval(secs => g), now(), now() - make_interval(secs => g), now()
+    FROM generate_series(1, %(jobs)s) g
+    """,
+    """
+    INSERT INTO idempotency_keys (user_id, key, request_hash, status_code, response)
+    SELECT 1 + g %% 50, 'key-' || g, md5(g::text), 201, '{}'
+    FROM generate_series(1, %(keys)s) g
+    """,
+]
+
+
+def seed(conn, sizes: dict):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA}")
+        cur.execute(f"SET search_path TO {SCHEMA}")
+        cur.execute(SCHEMA_DDL)
+        for stmt in SEED_SQL:
+            cur.execute(stmt, sizes)
+    conn.commit()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("VACUUM ANALYZE")
+    conn.autocommit = False
+
+
+def table_rows(conn) -> dict:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT c.relname, c.reltuples::bigint AS n
+            FROM pg_class c JOIN pg_namespace ns ON ns.oid = c.relnamespace
+            WHERE ns.nspname = %s AND c.relkind = 'r'
+            """,
+            (SCHEMA,),
+        )
+        return {r["relname"]: r["n"] for r in cur.fetchall()}
+
+
+def _seq_scans(node):
+    if node.get("Node Type") == "Seq Scan":
+        yield node.get("Relation Name")
+    for child in node.get("Plans", []):
+        yield from _seq_scans(child)
+
+
+def explain(conn, q: dict, runs: int):
+    """Best-of-`runs` EXPLAIN ANALYZE; every run is rolled back so writes leave no trace."""
+    best = None
+    for _ in range(runs):
+        try:
+            with conn.cursor() as cur:
+                cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + q["sql"], q["params"])
+                plan = cur.fetchone()["QUERY PLAN"][0]
+        finally:
+            conn.rollback()
+        if best is None or plan["Execution Time"] < best["Execution Time"]:
+            best = plan
+    return best
+
+
+def check(q: dict, plan: dict, rows: dict, large_rows: int) -> dict:
+    top = plan["Plan"]
+    ms = plan["Execution Time"]
+    buffers = top.get("Shared Hit Blocks", 0) + top.get("Shared Read Blocks", 0)
+    scans = sorted(set(_seq_scans(top)))
+    problems = []
+    for rel in scans:
+        if rows.get(rel, 0) >= large_rows and rel not in q["seq_scan_ok"]:
+            problems.append(f"seq scan on {rel} ({rows[rel]} rows)")
+    if q["max_ms"] is not None and ms > q["max_ms"]:
+        problems.append(f"{ms:.1f} ms > {q['max_ms']} ms")
+    if q["max_buffers"] is not None and buffers > q["max_buffers"]:
+        problems.append(f"{buffers} buffers > {q['max_buffers']}")
+    return {"name": q["name"], "ms": round(ms, 2), "buffers": buffers,
+            "seq_scans": scans, "problems": problems, "plan": plan}
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Check query plans for every registered query")
+    parser.add_argument("--dsn", default=os.getenv("PLAN_CHECK_DATABASE_URL", ""),
+                        help="scratch database (default: $PLAN_CHECK_DATABASE_URL)")
+    parser.add_argument("--reuse", action="store_true", help=f"keep the existing {SCHEMA} schema, skip seeding")
+    parser.add_argument("--employees", type=int, default=20000)
+    parser.add_argument("--weeks", type=int, default=52, help="timesheets per employee")
+    parser.add_argument("--months", type=int, default=12, help="payslips per employee")
+    parser.add_argument("--jobs", type=int, default=200000)
+    parser.add_argument("--keys", type=int, default=50000, help="idempotency keys")
+    parser.add_argument("--large-rows", type=int, default=10000,
+                        help="seq scans on tables at least this big are reported")
+    parser.add_argument("--runs", type=int, default=3, help="EXPLAIN runs per query (best time wins)")
+    parser.add_argument("--only", default="", help="comma-separated query name prefixes")
+    parser.add_argument("--json", dest="json_path", help="write the full report (with plans) here")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("set PLAN_CHECK_DATABASE_URL or pass --dsn (use a scratch database)")
+
+    queries = load_all()
+    prefixes = [p.strip() for p in args.only.split(",") if p.strip()]
+    selected = [q for name, q in sorted(queries.items())
+                if not prefixes or any(name.startswith(p) for p in prefixes)]
+
+    conn = psycopg2.connect(args.dsn, cursor_factory=RealDictCursor)
+    try:
+        if args.reuse:
+            with conn.cursor() as cur:
+                cur.execute(f"SET search_path TO {SCHEMA}")
+            conn.commit()
+        else:
+            print(f"Seeding {SCHEMA} ({args.employees} employees x {args.weeks} weeks)…")
+            seed(conn, {"employees": args.employees, "weeks": args.weeks, "months": args.months,
+                        "jobs": args.jobs, "keys": args.keys})
+        rows = table_rows(conn)
+
+        results = []
+        for q in selected:
+            try:
+                plan = explain(conn, q, args.runs)
+            except psycopg2.Error as e:
+                results.append({"name": q["name"], "ms": None, "buffers": None, "seq_scans": [],
+                                "problems": [f"error: {str(e).strip()}"], "plan": None})
+                continue
+            results.append(check(q, plan, rows, args.large_rows))
+    finally:
+        conn.close()
+
+    print(f"{'query':45s} {'ms':>9s} {'buffers':>9s}  seq scans / problems")
+    for r in results:
+        ms = f"{r['ms']:.2f}" if r["ms"] is not None else "-"
+        buffers = str(r["buffers"]) if r["buffers"] is not None else "-"
+        status = "; ".join(r["problems"]) if r["problems"] else "ok"
+        scans = ",".join(r["seq_scans"])
+        print(f"{r['name']:45s} {ms:>9s} {buffers:>9s}  {status}{'  [seq: ' + scans + ']' if scans else ''}")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, indent=2, default=str))
+
+    failed = [r for r in results if r["problems"]]
+    print(f"\n{len(results) - len(failed)}/{len(results)} queries within budget")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,8 @@ from flask import Blueprint, request, jsonify
 import os, time, jwt
 from werkzeug.security import check_password_hash
 from functools import wraps
-from db import fetch_one  # top-level import (db.py sits next to app.py)
+from db import fetch_one, read_only, set_sticky_key, reset_sticky_key  # top-level import (db.py sits next to app.py)
+from queries import named_query
 
 auth_bp = Blueprint("auth", __name__)
 JWT_SECRET = os.getenv("JWT_SECRET", "devsecret")
@@ -23,8 +24,25 @@ def require_auth(fn):
         except jwt.PyJWTError:
             return _unauth("invalid or expired token")
         request.user = payload  # {id,email,role}
-        return fn(*args, **kwargs)
+        # read-your-writes: this user's reads stick to the primary right after a write
+        sticky = set_sticky_key(payload.get("id"))
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            reset_sticky_key(sticky)
     return wrapper
+
+LOGIN_USER_SQL = named_query(
+    "auth.login_user",
+    """
+    SELECT id, email, role, password_hash
+    FROM users
+    WHERE lower(email) = lower(%s)
+    LIMIT 1
+    """,
+    params=("User42@bench.local",),
+)
+
 @auth_bp.post("/login")
 def login():
     data = request.get_json(force=True) or {}
@@ -34,15 +52,7 @@ def login():
         return _unauth("missing credentials")
 
     # Your schema has no 'username' and no 'password' column.
-    row = fetch_one(
-        """
-        SELECT id, email, role, password_hash
-        FROM users
-        WHERE lower(email) = lower(%s)
-        LIMIT 1
-        """,
-        (ident,),
-    )
+    row = fetch_one(LOGIN_USER_SQL, (ident,))
     if not row:
         return _unauth("invalid credentials")
 
@@ -55,24 +65,28 @@ def login():
     return jsonify({"token": token, "role": row["role"]}), 200
 
 
+ME_SQL = named_query(
+    "auth.me",
+    """
+    SELECT
+      u.id              AS user_id,
+      u.email           AS email,
+      u.role            AS role,
+      e.id              AS employee_id,
+      COALESCE(e.full_name, e.name, u.email) AS full_name,
+      COALESCE(e.rate, 0) AS rate
+    FROM users u
+    LEFT JOIN employees e ON e.user_id = u.id
+    WHERE u.id = %s
+    """,
+    params=(42,),
+)
+
 @auth_bp.get("/me")
 @require_auth
+@read_only
 def me():
-    row = fetch_one(
-        """
-        SELECT
-          u.id              AS user_id,
-          u.email           AS email,
-          u.role            AS role,
-          e.id              AS employee_id,
-          COALESCE(e.full_name, e.name, u.email) AS full_name,
-          COALESCE(e.rate, 0) AS rate
-        FROM users u
-        LEFT JOIN employees e ON e.user_id = u.id
-        WHERE u.id = %s
-        """,
-        (request.user["id"],),
-    )
+    row = fetch_one(ME_SQL, (request.user["id"],))
     if not row: return jsonify({"error": "not_found"}), 404
     # return as dict (psycopg2.extras.DictCursor recommended)
     return jsonify(dict(row)), 200
@@ -1,19 +1,55 @@
 # src/routes/employees.py
-from flask import Blueprint, jsonify
+import hashlib
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from flask import Blueprint, request, jsonify
+import psycopg2
+from psycopg2.extras import Json, execute_values
+from werkzeug.security import generate_password_hash
 from .auth import require_auth
-from db import fetch_all
+from db import fetch_all, fetch_one, get_conn, note_write, read_only
+from queries import named_query
 
 employees_bp = Blueprint("employees", __name__)
 
+# max rows per POST/PATCH; onboarding 10k staff is a handful of requests
+BATCH_MAX = int(os.getenv("EMPLOYEE_BATCH_MAX", "1000"))
+# werkzeug's scrypt hashing runs in hashlib, which releases the GIL,
+# so a thread pool hashes a batch in parallel
+_hash_pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+
+COLUMNS_SQL = named_query(
+    "employees.columns",
+    """
+    SELECT column_name
+    FROM information_schema.columns
+    WHERE table_name = %s
+    """,
+    params=("employees",),
+)
+
+# {name_expr} depends on which name columns the schema has (see list_employees)
+LIST_EMPLOYEES_SQL = """
+    SELECT
+      e.id,
+      {name_expr} AS name,
+      e.email,
+      e.rate
+    FROM employees e
+    ORDER BY e.id
+"""
+named_query(
+    "employees.list",
+    LIST_EMPLOYEES_SQL.format(name_expr="COALESCE(e.full_name, e.name)"),
+    # returns every row by design
+    seq_scan_ok=("employees",), max_ms=None, max_buffers=None,
+)
+
 def _cols(table: str) -> set:
-    rows = fetch_all(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_name = %s
-        """,
-        (table,),
-    )
+    rows = fetch_all(COLUMNS_SQL, (table,))
     # rows may be list[tuple] or list[dict]
     out = set()
     for r in rows:
@@ -23,6 +59,7 @@ def _cols(table: str) -> set:
 @employees_bp.get("")
 @employees_bp.get("/")
 @require_auth
+@read_only
 def list_employees():
     """
     Returns: [{id, name, email, rate}]
@@ -39,16 +76,7 @@ def list_employees():
     else:
         name_expr = "''::text"
 
-    sql = f"""
-        SELECT
-          e.id,
-          {name_expr} AS name,
-          e.email,
-          e.rate
-        FROM employees e
-        ORDER BY e.id
-    """
-    rows = fetch_all(sql)
+    rows = fetch_all(LIST_EMPLOYEES_SQL.format(name_expr=name_expr))
 
     out = []
     for r in rows:
@@ -68,3 +96,411 @@ def list_employees():
                 "rate": float(r.get("rate") or 0),
             })
     return jsonify(out), 200
+
+# ------------------------
+# Batched create / update
+# ------------------------
+# employees.rate is NUMERIC(10,2)
+RATE_MAX = Decimal("99999999.99")
+
+def _forbidden():
+    return jsonify({"error": "forbidden"}), 403
+
+def _invalid(details):
+    return jsonify({"error": "invalid_payload", "details": details}), 400
+
+def _out(r) -> dict:
+    return {"id": r["id"], "name": r["name"], "email": r["email"], "rate": float(r["rate"] or 0)}
+
+def _parse_rate(value):
+    """Returns the rate as a 2-place Decimal (None if absent); raises ValueError if unusable."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError("rate must be a number")
+    try:
+        rate = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError("rate must be a number")
+    if not rate.is_finite():
+        raise ValueError("rate must be a finite number")
+    # range-check before rounding (quantize() raises on huge exponents) and after it
+    if rate < 0 or rate > RATE_MAX or rate.quantize(Decimal("0.01")) > RATE_MAX:
+        raise ValueError(f"rate must be between 0 and {RATE_MAX}")
+    return rate.quantize(Decimal("0.01"))
+
+def parse_employee_items(data, partial: bool):
+    """
+    Validates a list of {name, email, rate, password?}.
+    partial=True (PATCH): only email is required.
+    Returns (items, errors); emails are lower-cased, duplicates rejected,
+    and each item keeps its position in the request as "index".
+    """
+    items, errors, seen = [], [], set()
+    for i, raw in enumerate(data):
+        if not isinstance(raw, dict):
+            errors.append({"index": i, "error": "not an object"})
+            continue
+        bad = [f for f in ("email", "name", "password") if raw.get(f) is not None and not isinstance(raw[f], str)]
+        if bad:
+            errors.append({"index": i, "error": f"{bad[0]} must be a string"})
+            continue
+        email = (raw.get("email") or "").strip().lower()
+        name = (raw.get("name") or "").strip() or None
+        password = raw.get("password") or None
+        if not email:
+            errors.append({"index": i, "error": "missing email"})
+            continue
+        if email in seen:
+            errors.append({"index": i, "error": "duplicate email"})
+            continue
+        seen.add(email)
+        try:
+            rate = _parse_rate(raw.get("rate"))
+        except ValueError as e:
+            errors.append({"index": i, "error": str(e)})
+            continue
+        if not partial and not name:
+            errors.append({"index": i, "error": "missing name"})
+            continue
+        items.append({"index": i, "email": email, "name": name, "rate": rate, "password": password})
+    return items, errors
+
+def hash_passwords(items):
+    """Adds password_hash to every item that carries a password, hashing in parallel."""
+    todo = [it for it in items if it["password"]]
+    for it, h in zip(todo, _hash_pool.map(generate_password_hash, [it["password"] for it in todo])):
+        it["password_hash"] = h
+
+CLAIM_IDEMPOTENCY_KEY_SQL = named_query(
+    "idempotency.claim",
+    """
+    INSERT INTO idempotency_keys (user_id, key, request_hash)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (user_id, key) DO NOTHING
+    RETURNING key
+    """,
+    params=(1, "bench-key-42", "0" * 64),
+)
+GET_IDEMPOTENCY_KEY_SQL = named_query(
+    "idempotency.get",
+    "SELECT request_hash, status_code, response FROM idempotency_keys WHERE user_id = %s AND key = %s",
+    params=(1, "bench-key-42"),
+)
+STORE_IDEMPOTENT_RESPONSE_SQL = named_query(
+    "idempotency.store",
+    "UPDATE idempotency_keys SET response = %s, status_code = %s WHERE user_id = %s AND key = %s",
+    params=("{}", 201, 1, "bench-key-42"),
+)
+
+def _replay(prev, body_hash: str):
+    if prev["request_hash"] != body_hash:
+        return {"error": "idempotency_key_reused"}, 422
+    return prev["response"], prev["status_code"]
+
+def _claim_idempotency_key(cur, key: str, body_hash: str):
+    """
+    Reserves (user, Idempotency-Key) inside the caller's transaction.
+    Returns None if the key is new, else the (body, status) to replay.
+    A concurrent retry with the same key blocks on the insert until the
+    first request commits, then replays its stored response.
+    """
+    uid = request.user["id"]
+    cur.execute(CLAIM_IDEMPOTENCY_KEY_SQL, (uid, key, body_hash))
+    if cur.fetchone():
+        return None
+    cur.execute(GET_IDEMPOTENCY_KEY_SQL, (uid, key))
+    return _replay(cur.fetchone(), body_hash)
+
+def _store_idempotent_response(cur, key: str, body, status: int):
+    cur.execute(STORE_IDEMPOTENT_RESPONSE_SQL, (Json(body), status, request.user["id"], key))
+
+def _idempotent(handler, items):
+    """
+    Runs handler(cur, items) -> (body, status) in one transaction, honouring Idempotency-Key.
+    Passwords are hashed before the transaction opens so the slow part
+    doesn't hold row locks; a retry of a finished request skips hashing.
+    """
+    key = (request.headers.get("Idempotency-Key") or "").strip()
+    body_hash = hashlib.sha256(request.get_data()).hexdigest()
+    if key:
+        prev = fetch_one(GET_IDEMPOTENCY_KEY_SQL, (request.user["id"], key), readonly=False)
+        if prev and prev["status_code"] is not None:
+            body, status = _replay(prev, body_hash)
+            return jsonify(body), status
+
+    hash_passwords(items)
+    try:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                if key:
+                    replay = _claim_idempotency_key(cur, key, body_hash)
+                    if replay is not None:
+                        return jsonify(replay[0]), replay[1]
+                body, status = handler(cur, items)
+                if key:
+                    _store_idempotent_response(cur, key, body, status)
+    except psycopg2.IntegrityError:
+        # a concurrent request created one of these users/employees first
+        return jsonify({"error": "conflict", "details": "a concurrent request changed these employees; retry"}), 409
+    note_write()
+    return jsonify(body), status
+
+# Emails are matched case-insensitively (lower(email)) everywhere below.
+# VALUES %s statements run through execute_values; the sample params are one row.
+FIND_USERS_SQL = named_query(
+    "employees.find_users",
+    "SELECT id, lower(email) AS key, role FROM users WHERE lower(email) = ANY(%s)",
+    params=(["user42@bench.local"],),
+)
+FIND_EMPLOYEES_SQL = named_query(
+    "employees.find_by_email",
+    "SELECT id, user_id, lower(email) AS key FROM employees WHERE lower(email) = ANY(%s)",
+    params=(["user42@bench.local"],),
+)
+FIND_EMPLOYEES_BY_USER_SQL = named_query(
+    "employees.find_by_user",
+    "SELECT id, user_id FROM employees WHERE user_id = ANY(%s)",
+    params=([41, 42, 43],),
+)
+INSERT_USERS_SQL = named_query(
+    "employees.insert_users",
+    """
+    INSERT INTO users (email, role, password_hash) VALUES %s
+    ON CONFLICT DO NOTHING
+    RETURNING id, lower(email) AS key
+    """,
+    params=(("new42@bench.local", "employee", "x"),),
+)
+SET_USER_PASSWORDS_SQL = named_query(
+    "employees.set_user_passwords",
+    """
+    UPDATE users u SET password_hash = v.hash
+      FROM (VALUES %s) AS v(id, hash)
+     WHERE u.id = v.id AND u.role = 'employee'
+    RETURNING u.id
+    """,
+    params=((42, "x"),),
+)
+UPDATE_EMPLOYEES_BY_ID_SQL = named_query(
+    "employees.update_by_id",
+    """
+    UPDATE employees e
+       SET user_id = v.user_id, full_name = v.name, email = v.email,
+           rate = COALESCE(v.rate, e.rate)
+      FROM (VALUES %s) AS v(id, user_id, name, email, rate)
+     WHERE e.id = v.id
+    RETURNING e.id, e.full_name AS name, e.email, e.rate
+    """,
+    params=((42, 42, "Employee 42", "user42@bench.local", 25),),
+)
+# upsert_employees only inserts for users without an employee row, so a
+# unique violation here means a concurrent request got there first
+INSERT_EMPLOYEES_SQL = named_query(
+    "employees.insert",
+    """
+    INSERT INTO employees (user_id, full_name, email, rate) VALUES %s
+    RETURNING id, full_name AS name, email, rate
+    """,
+    params=((42, "Employee 42", "user42@bench.local", 25),),
+)
+UPDATE_EMPLOYEES_SQL = named_query(
+    "employees.update",
+    """
+    UPDATE employees e
+       SET full_name = COALESCE(v.name, e.full_name),
+           rate      = COALESCE(v.rate, e.rate)
+      FROM (VALUES %s) AS v(email, name, rate)
+     WHERE lower(e.email) = v.email
+    RETURNING e.id, e.user_id, e.full_name AS name, e.email, e.rate, v.email AS key
+    """,
+    params=(("user42@bench.local", "Employee 42", 26),),
+)
+UPDATE_USER_PASSWORDS_SQL = named_query(
+    "employees.update_passwords",
+    """
+    UPDATE users u SET password_hash = v.hash
+      FROM (VALUES %s) AS v(user_id, hash)
+     WHERE u.id = v.user_id AND u.role = 'employee'
+    RETURNING u.id
+    """,
+    params=((42, "x"),),
+)
+
+def _by_key(cur, query, keys) -> dict:
+    """lower(email) -> [matching rows]"""
+    cur.execute(query, (keys,))
+    out = {}
+    for r in cur.fetchall():
+        out.setdefault(r["key"], []).append(r)
+    return out
+
+def _conflict(it, error: str) -> dict:
+    return {"index": it["index"], "email": it["email"], "error": error}
+
+def upsert_employees(cur, items):
+    """
+    Creates or updates users + employees by email (passwords already hashed,
+    see hash_passwords). An omitted rate keeps an existing employee's rate
+    (0 for new ones). Rows that can't be applied safely are skipped and
+    reported in "conflicts"; the rest are written. 409 if nothing was.
+    """
+    keys = [it["email"] for it in items]
+    users = _by_key(cur, FIND_USERS_SQL, keys)
+    emps = _by_key(cur, FIND_EMPLOYEES_SQL, keys)
+    # a matched user may already own an employee row filed under another email
+    user_ids = [r["id"] for rows in users.values() for r in rows]
+    emp_of_user = {}
+    if user_ids:
+        cur.execute(FIND_EMPLOYEES_BY_USER_SQL, (user_ids,))
+        emp_of_user = {r["user_id"]: r["id"] for r in cur.fetchall()}
+
+    conflicts, ok = [], []
+    for it in items:
+        user_rows, emp_rows = users.get(it["email"], []), emps.get(it["email"], [])
+        user = user_rows[0] if user_rows else None
+        emp = emp_rows[0] if emp_rows else None
+        if len(user_rows) > 1 or len(emp_rows) > 1:
+            conflicts.append(_conflict(it, "email matches more than one account"))
+        elif emp and emp["user_id"] is not None and (user is None or emp["user_id"] != user["id"]):
+            conflicts.append(_conflict(it, "employee is linked to a different user"))
+        elif user and user["id"] in emp_of_user and (emp is None or emp_of_user[user["id"]] != emp["id"]):
+            conflicts.append(_conflict(it, "user already linked to a different employee"))
+        elif user and user["role"] != "employee" and it["password"]:
+            conflicts.append(_conflict(it, f"can't set the password of a {user['role']} account"))
+        else:
+            it["user_id"] = user["id"] if user else None
+            it["employee_id"] = emp["id"] if emp else None
+            ok.append(it)
+
+    # existing employee logins get the new password; other roles are never touched
+    pw_rows = [(it["user_id"], it["password_hash"]) for it in ok if it["password"] and it["user_id"] is not None]
+    if pw_rows:
+        execute_values(cur, SET_USER_PASSWORDS_SQL, pw_rows, page_size=len(pw_rows))
+
+    # users sent without a password get an unusable random hash on insert
+    # and keep their existing hash on update
+    new_users = [it for it in ok if it["user_id"] is None]
+    if new_users:
+        rows = execute_values(
+            cur, INSERT_USERS_SQL,
+            [(it["email"], "employee", it.get("password_hash") or "!" + secrets.token_hex(16)) for it in new_users],
+            page_size=len(new_users), fetch=True,
+        )
+        created = {r["key"]: r["id"] for r in rows}
+        for it in new_users:
+            it["user_id"] = created.get(it["email"])
+            if it["user_id"] is None:
+                conflicts.append(_conflict(it, "user was created by a concurrent request; retry"))
+        ok = [it for it in ok if it["user_id"] is not None]
+
+    out = {}
+    existing = [it for it in ok if it["employee_id"] is not None]
+    if existing:
+        rows = execute_values(
+            cur, UPDATE_EMPLOYEES_BY_ID_SQL,
+            [(it["employee_id"], it["user_id"], it["name"], it["email"], it["rate"]) for it in existing],
+            template="(%s, %s, %s, %s, %s::numeric)", page_size=len(existing), fetch=True,
+        )
+        out.update({r["id"]: r for r in rows})
+    fresh = [it for it in ok if it["employee_id"] is None]
+    if fresh:
+        rows = execute_values(
+            cur, INSERT_EMPLOYEES_SQL,
+            [(it["user_id"], it["name"], it["email"], it["rate"] or 0) for it in fresh],
+            page_size=len(fresh), fetch=True,
+        )
+        out.update({r["id"]: r for r in rows})
+
+    conflicts.sort(key=lambda c: c["index"])
+    body = {"employees": [_out(r) for r in out.values()], "conflicts": conflicts}
+    return body, (201 if out or not conflicts else 409)
+
+def _update_employees(cur, items):
+    emps = _by_key(cur, FIND_EMPLOYEES_SQL, [it["email"] for it in items])
+    conflicts = [_conflict(it, "email matches more than one employee")
+                 for it in items if len(emps.get(it["email"], [])) > 1]
+    todo = [it for it in items if len(emps.get(it["email"], [])) == 1]
+
+    rows = []
+    if todo:
+        rows = execute_values(
+            cur, UPDATE_EMPLOYEES_SQL,
+            [(it["email"], it["name"], it["rate"]) for it in todo],
+            template="(%s, %s::text, %s::numeric)", page_size=len(todo), fetch=True,
+        )
+    updated = {r["key"]: r for r in rows}
+
+    # passwords follow the employee's login (employees.user_id), not its email
+    pw = [it for it in todo if it["password"] and it["email"] in updated]
+    no_login = [it for it in pw if updated[it["email"]]["user_id"] is None]
+    pw = [it for it in pw if updated[it["email"]]["user_id"] is not None]
+    changed = set()
+    if pw:
+        rows = execute_values(
+            cur, UPDATE_USER_PASSWORDS_SQL,
+            [(updated[it["email"]]["user_id"], it["password_hash"]) for it in pw],
+            page_size=len(pw), fetch=True,
+        )
+        changed = {r["id"] for r in rows}
+    conflicts += [_conflict(it, "employee has no login; password not set") for it in no_login]
+    conflicts += [_conflict(it, "login is not an employee account; password not changed")
+                  for it in pw if updated[it["email"]]["user_id"] not in changed]
+    conflicts.sort(key=lambda c: c["index"])
+
+    not_found = [it["email"] for it in items if not emps.get(it["email"])]
+    return {"employees": [_out(r) for r in updated.values()], "notFound": not_found, "conflicts": conflicts}, 200
+
+@employees_bp.post("")
+@employees_bp.post("/")
+@require_auth
+def create_employees():
+    """
+    POST /api/employees  {name, email, rate?, password?}      -> Employee
+    POST /api/employees  [{name, email, rate?, password?}...] -> {employees: [...], conflicts: [...]}
+    Upserts users + employees by email (case-insensitive) in one transaction;
+    an omitted rate leaves an existing employee's rate unchanged.
+    Send an Idempotency-Key header to make retries safe.
+    """
+    if request.user.get("role") != "manager":
+        return _forbidden()
+    data = request.get_json(silent=True)
+    single = isinstance(data, dict)
+    batch = [data] if single else data
+    if not isinstance(batch, list) or not batch:
+        return _invalid([{"error": "expected an object or a non-empty array"}])
+    if len(batch) > BATCH_MAX:
+        return _invalid([{"error": f"at most {BATCH_MAX} employees per request"}])
+    items, errors = parse_employee_items(batch, partial=False)
+    if errors:
+        return _invalid(errors)
+
+    if single:
+        def upsert_one(cur, items):
+            body, status = upsert_employees(cur, items)
+            if body["conflicts"]:
+                return {"error": "conflict", "details": body["conflicts"]}, 409
+            return body["employees"][0], status
+        return _idempotent(upsert_one, items)
+    return _idempotent(upsert_employees, items)
+
+@employees_bp.patch("")
+@employees_bp.patch("/")
+@require_auth
+def update_employees():
+    """
+    PATCH /api/employees [{email, name?, rate?, password?}...]
+      -> {employees: [...updated], notFound: [emails], conflicts: [...]}
+    Employees are matched by email (case-insensitive); omitted fields are left unchanged.
+    """
+    if request.user.get("role") != "manager":
+        return _forbidden()
+    data = request.get_json(silent=True)
+    if not isinstance(data, list) or not data:
+        return _invalid([{"error": "expected a non-empty array"}])
+    if len(data) > BATCH_MAX:
+        return _invalid([{"error": f"at most {BATCH_MAX} employees per request"}])
+    items, errors = parse_employee_items(data, partial=True)
+    if errors:
+        return _invalid(errors)
+    return _idempotent(_update_employees, items)
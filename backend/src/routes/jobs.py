@@ -0,0 +1,58 @@
+# src/routes/jobs.py
+from flask import Blueprint, request, jsonify
+from .auth import require_auth
+import jobs
+import tasks  # noqa: F401  (registers job types)
+
+jobs_bp = Blueprint("jobs", __name__)
+
+def _job(r):
+    return {
+        "id": r["id"],
+        "type": r["job_type"],
+        "status": r["status"],
+        "progress": r["progress"],
+        "attempts": r["attempts"],
+        "maxAttempts": r["max_attempts"],
+        "result": r["result"],
+        "error": r["error"],
+        "runAt": r["run_at"],
+        "createdAt": r["created_at"],
+        "updatedAt": r["updated_at"],
+    }
+
+@jobs_bp.post("")
+@jobs_bp.post("/")
+@require_auth
+def enqueue_job():
+    """
+    POST /api/jobs {type, payload} -> 202 {id, status, statusUrl}
+    Returns immediately; a worker process (python worker.py) runs the job.
+    """
+    if request.user.get("role") != "manager":
+        return jsonify({"error": "forbidden"}), 403
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    job_type = data.get("type")
+    job_type = job_type.strip() if isinstance(job_type, str) else ""
+    payload = data.get("payload") or {}
+    if job_type not in jobs.job_types() or not isinstance(payload, dict):
+        return jsonify({"error": "invalid_payload", "types": jobs.job_types()}), 400
+
+    try:
+        job_id = jobs.enqueue(job_type, payload, created_by=request.user["id"])
+    except ValueError as e:
+        return jsonify({"error": "invalid_payload", "details": str(e)}), 400
+    return jsonify({"id": job_id, "status": "queued", "statusUrl": f"/api/jobs/{job_id}"}), 202
+
+@jobs_bp.get("/<int:job_id>")
+@require_auth
+def job_status(job_id: int):
+    """GET /api/jobs/<id> -> status, progress (0..100), result or error."""
+    row = jobs.get_job(job_id)
+    if not row:
+        return jsonify({"error": "not_found"}), 404
+    if request.user.get("role") != "manager" and row["created_by"] != request.user["id"]:
+        return jsonify({"error": "forbidden"}), 403
+    return jsonify(_job(row)), 200
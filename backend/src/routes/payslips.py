@@ -2,103 +2,148 @@
 from flask import Blueprint, request, jsonify, send_file, abort
 from io import BytesIO
 from src.routes.auth import require_auth
-from db import fetch_all, fetch_one
+from db import fetch_all, fetch_one, read_only
+from queries import named_query
+from pathlib import Path
+import hashlib
 import os
 
 payslips_bp = Blueprint("payslips", __name__)
 
+# backend root; a relative PAYSLIP_STORAGE is resolved against it so the web
+# app and worker.py agree on the location whatever directory they start in
+ROOT = Path(__file__).resolve().parents[2]
+
+# PDFs pre-rendered by the "payslips.render" job land here as
+# <employee_id>/<payslip_id>-<version>.pdf
+STORAGE_DIR = ROOT / os.getenv("PAYSLIP_STORAGE", "storage/payslips")
+
+def rendered_pdf_path(row) -> Path:
+    """
+    Where the PDF for a payslip row (employee_id, id, employee_name, ps, pe,
+    gross, net) is stored. The file name includes a digest of the printed
+    fields, so editing the payslip makes the old file a cache miss.
+    """
+    printed = "|".join(str(row[k]) for k in ("employee_name", "ps", "pe", "gross", "net"))
+    version = hashlib.sha256(printed.encode("utf-8")).hexdigest()[:12]
+    return STORAGE_DIR / str(row["employee_id"]) / f"{row['id']}-{version}.pdf"
+
+def build_payslip_pdf(pid_db, emp_name, ps, pe, gross, net):
+    """
+    Returns (bytes, mimetype, download_name): a PDF if reportlab is
+    available, otherwise a plain-text fallback.
+    """
+    # --- build a tiny PDF (uses reportlab if available) ---
+    try:
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.pagesizes import letter
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=letter)
+        y = 720
+        c.setFont("Helvetica", 12)
+        c.drawString(72, y,   f"Payslip ID: {pid_db}"); y -= 24
+        c.drawString(72, y,   f"Employee: {emp_name}"); y -= 24
+        c.drawString(72, y,   f"Period: {ps} to {pe}"); y -= 24
+        c.drawString(72, y,   f"Gross Pay: ${float(gross or 0):.2f}"); y -= 24
+        c.drawString(72, y,   f"Net Pay:   ${float(net   or 0):.2f}")
+        c.showPage(); c.save()
+        return buffer.getvalue(), "application/pdf", f"payslip_{pid_db}.pdf"
+    except Exception:
+        # Fallback: simple text if reportlab isn't present
+        content = (
+            f"Payslip ID: {pid_db}\n"
+            f"Employee: {emp_name}\n"
+            f"Period: {ps} to {pe}\n"
+            f"Gross Pay: ${float(gross or 0):.2f}\n"
+            f"Net Pay: ${float(net or 0):.2f}\n"
+        ).encode("utf-8")
+        return content, "application/octet-stream", f"payslip_{pid_db}.txt"
+
+EMPLOYEE_FOR_USER_SQL = named_query(
+    "payslips.employee_for_user", "SELECT id FROM employees WHERE user_id = %s", params=(42,),
+)
+MY_PAYSLIPS_SQL = named_query(
+    "payslips.mine",
+    """
+    SELECT id, employee_id,
+           to_char(period_start, 'YYYY-MM-DD') AS ps,
+           to_char(period_end,   'YYYY-MM-DD') AS pe,
+           gross, net
+    FROM payslips
+    WHERE employee_id = %s
+    ORDER BY period_end ASC, id ASC
+    """,
+    params=(42,),
+)
+
 @payslips_bp.get("/me")
 @require_auth
+@read_only
 def my_payslips():
     uid = request.user["id"]
     # find employee_id for this user
-    emp = fetch_one("SELECT id FROM employees WHERE user_id = %s", (uid,))
+    emp = fetch_one(EMPLOYEE_FOR_USER_SQL, (uid,))
     if not emp:
         return jsonify([])
 
-    rows = fetch_all("""
-        SELECT id, employee_id,
-               to_char(period_start, 'YYYY-MM-DD') AS ps,
-               to_char(period_end,   'YYYY-MM-DD') AS pe,
-               gross, net
-        FROM payslips
-        WHERE employee_id = %s
-        ORDER BY period_end ASC, id ASC
-    """, (emp[0],))
+    rows = fetch_all(MY_PAYSLIPS_SQL, (emp["id"],))
 
     out = []
     for r in rows:
-        pid, eid, ps, pe, gross, net = r
         out.append({
-            "id": pid,
-            "period": f"{ps} to {pe}",
-            "gross": float(gross or 0),
-            "net": float(net or 0),
-            "pdfUrl": f"/api/payslips/{pid}/pdf"
+            "id": r["id"],
+            "period": f"{r['ps']} to {r['pe']}",
+            "gross": float(r["gross"] or 0),
+            "net": float(r["net"] or 0),
+            "pdfUrl": f"/api/payslips/{r['id']}/pdf"
         })
     return jsonify(out)
 
 
+PAYSLIP_PDF_SQL = named_query(
+    "payslips.pdf_row",
+    """
+    SELECT p.id,
+           e.id                              AS employee_id,
+           COALESCE(e.full_name, e.name, u.email) AS employee_name,
+           to_char(p.period_start, 'YYYY-MM-DD')  AS ps,
+           to_char(p.period_end,   'YYYY-MM-DD')  AS pe,
+           p.gross, p.net,
+           e.user_id
+    FROM payslips p
+    JOIN employees e ON e.id = p.employee_id
+    JOIN users     u ON u.id = e.user_id
+    WHERE p.id = %s
+    """,
+    params=(42,),
+)
+
 @payslips_bp.get("/<int:pid>/pdf")
 @require_auth
+@read_only
 def payslip_pdf(pid: int):
     """Stream a real PDF for the given payslip id. Employees can only view their own."""
     uid = request.user["id"]
     role = request.user.get("role", "employee")
 
-    row = fetch_one("""
-        SELECT p.id,
-               e.id                              AS employee_id,
-               COALESCE(e.full_name, e.name, u.email) AS employee_name,
-               to_char(p.period_start, 'YYYY-MM-DD')  AS ps,
-               to_char(p.period_end,   'YYYY-MM-DD')  AS pe,
-               p.gross, p.net,
-               e.user_id
-        FROM payslips p
-        JOIN employees e ON e.id = p.employee_id
-        JOIN users     u ON u.id = e.user_id
-        WHERE p.id = %s
-    """, (pid,))
+    row = fetch_one(PAYSLIP_PDF_SQL, (pid,))
     if not row:
         abort(404)
 
-    (pid_db, emp_id, emp_name, ps, pe, gross, net, payslip_user_id) = row
-
     # employee can only download their own
-    if role != "manager" and payslip_user_id != uid:
+    if role != "manager" and row["user_id"] != uid:
         abort(403)
 
-    # --- build a tiny PDF (uses reportlab if available) ---
-    try:
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.pagesizes import letter
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=letter)
-        y = 720
-        c.setFont("Helvetica", 12)
-        c.drawString(72, y,   f"Payslip ID: {pid_db}"); y -= 24
-        c.drawString(72, y,   f"Employee: {emp_name}"); y -= 24
-        c.drawString(72, y,   f"Period: {ps} to {pe}"); y -= 24
-        c.drawString(72, y,   f"Gross Pay: ${float(gross or 0):.2f}"); y -= 24
-        c.drawString(72, y,   f"Net Pay:   ${float(net   or 0):.2f}")
-        c.showPage(); c.save()
-        buffer.seek(0)
-        return send_file(
-            buffer,
-            mimetype="application/pdf",
-            as_attachment=False,
-            download_name=f"payslip_{pid_db}.pdf"
-        )
-    except Exception:
-        # Fallback: simple text if reportlab isn't present
-        content = (
-            f"Payslip ID: {pid_db}\n"
-            f"Employee: {emp_name}\n"
-            f"Period: {ps} to {pe}\n"
-            f"Gross Pay: ${float(gross or 0):.2f}\n"
-            f"Net Pay: ${float(net or 0):.2f}\n"
-        ).encode("utf-8")
-        return send_file(BytesIO(content),
-            mimetype="application/octet-stream",
-            as_attachment=True,
-            download_name=f"payslip_{pid_db}.txt")
+    # served straight from disk when a render job has already produced it
+    cached = rendered_pdf_path(row)
+    if cached.is_file():
+        return send_file(cached.resolve(), mimetype="application/pdf",
+                         as_attachment=False, download_name=f"payslip_{row['id']}.pdf")
+
+    data, mimetype, name = build_payslip_pdf(
+        row["id"], row["employee_name"], row["ps"], row["pe"], row["gross"], row["net"],
+    )
+    return send_file(BytesIO(data),
+        mimetype=mimetype,
+        as_attachment=mimetype != "application/pdf",
+        download_name=name)
@@ -1,7 +1,8 @@
 # src/routes/timesheets.py
 from flask import Blueprint, request, jsonify
 from .auth import require_auth
-from db import fetch_all, fetch_one, execute
+from db import fetch_all, fetch_one, execute, read_only
+from queries import named_query
 
 timesheets_bp = Blueprint("timesheets", __name__)
 
@@ -16,9 +17,52 @@ def _row(r):
         "status": (r.get("status") or "").lower(),
     }
 
+# one latest timesheet per employee by week_start desc (and id as tiebreaker);
+# a LIMIT 1 probe per employee on timesheets_employee_week_idx instead of
+# sorting the whole timesheets table for DISTINCT ON. Same rows as
+# DISTINCT ON (employee_id): timesheets without an employee (employee_id
+# is nullable) form one more group, listed last.
+LATEST_TIMESHEETS_SQL = named_query(
+    "timesheets.latest_per_employee",
+    """
+    SELECT id, employee_id, week_start, hours, status
+    FROM (
+        SELECT t.id, t.employee_id, t.week_start, t.hours, t.status
+        FROM employees e
+        CROSS JOIN LATERAL (
+            SELECT id, employee_id, week_start, hours, status
+            FROM timesheets
+            WHERE employee_id = e.id
+            ORDER BY week_start DESC, id DESC
+            LIMIT 1
+        ) t
+        UNION ALL
+        (SELECT id, employee_id, week_start, hours, status
+         FROM timesheets
+         WHERE employee_id IS NULL
+         ORDER BY week_start DESC, id DESC
+         LIMIT 1)
+    ) latest
+    ORDER BY employee_id NULLS LAST
+    """,
+    seq_scan_ok=("employees",), max_ms=300, max_buffers=200000,
+)
+
+ALL_TIMESHEETS_SQL = named_query(
+    "timesheets.all",
+    """
+    SELECT id, employee_id, week_start, hours, status
+    FROM timesheets
+    ORDER BY week_start DESC, id DESC
+    """,
+    # returns every row by design
+    seq_scan_ok=("timesheets",), max_ms=None, max_buffers=None,
+)
+
 @timesheets_bp.get("")
 @timesheets_bp.get("/")
 @require_auth
+@read_only
 def list_timesheets():
     """
     GET /api/timesheets             -> all rows (ordered latest first)
@@ -26,58 +70,52 @@ def list_timesheets():
     """
     latest = request.args.get("latest", "").strip().lower() in ("1", "true", "yes")
 
-    if latest:
-        # one latest timesheet per employee by week_start desc (and id as tiebreaker)
-        rows = fetch_all(
-            """
-            SELECT DISTINCT ON (t.employee_id)
-                   t.id, t.employee_id, t.week_start, t.hours, t.status
-            FROM timesheets t
-            ORDER BY t.employee_id, t.week_start DESC, t.id DESC
-            """
-        )
-    else:
-        rows = fetch_all(
-            """
-            SELECT id, employee_id, week_start, hours, status
-            FROM timesheets
-            ORDER BY week_start DESC, id DESC
-            """
-        )
+    rows = fetch_all(LATEST_TIMESHEETS_SQL if latest else ALL_TIMESHEETS_SQL)
 
     return jsonify([_row(r) for r in rows])
 
+MY_TIMESHEETS_SQL = named_query(
+    "timesheets.mine",
+    """
+    SELECT t.id, t.employee_id, t.week_start, t.hours, t.status
+    FROM timesheets t
+    JOIN employees e ON e.id = t.employee_id
+    JOIN users u      ON u.id = e.user_id
+    WHERE u.id = %s
+    ORDER BY t.week_start DESC, t.id DESC
+    """,
+    params=(42,),
+)
+
 @timesheets_bp.get("/me")
 @require_auth
+@read_only
 def my_timesheets():
     uid = request.user["id"]
-    rows = fetch_all(
-        """
-        SELECT t.id, t.employee_id, t.week_start, t.hours, t.status
-        FROM timesheets t
-        JOIN employees e ON e.id = t.employee_id
-        JOIN users u      ON u.id = e.user_id
-        WHERE u.id = %s
-        ORDER BY t.week_start DESC, t.id DESC
-        """,
-        (uid,),
-    )
+    rows = fetch_all(MY_TIMESHEETS_SQL, (uid,))
     items = [{"id": r[0], "employeeId": r[1], "weekStart": str(r[2]), "hours": float(r[3]), "status": r[4]} for r in rows]
     return jsonify(items)
 
 # ---- Approve timesheet ----
+FIND_TIMESHEET_SQL = named_query(
+    "timesheets.find", "SELECT id, status FROM timesheets WHERE id = %s", params=(42,),
+)
+APPROVE_TIMESHEET_SQL = named_query(
+    "timesheets.approve", "UPDATE timesheets SET status = 'APPROVED' WHERE id = %s", params=(42,),
+)
+
 @timesheets_bp.patch("/<int:ts_id>/approve")
 @timesheets_bp.patch("/<int:ts_id>/approve/")
 @timesheets_bp.post("/<int:ts_id>/approve")
 @timesheets_bp.post("/<int:ts_id>/approve/")
 @require_auth
 def approve_timesheet(ts_id: int):
-    found = fetch_one("SELECT id, status FROM timesheets WHERE id = %s", (ts_id,))
+    found = fetch_one(FIND_TIMESHEET_SQL, (ts_id,))
     if not found:
         return jsonify({"error": "not_found"}), 404
 
     if (found["status"] or "").upper() == "APPROVED":
         return jsonify({"ok": True, "already": True})
 
-    execute("UPDATE timesheets SET status = 'APPROVED' WHERE id = %s", (ts_id,))
+    execute(APPROVE_TIMESHEET_SQL, (ts_id,))
     return jsonify({"ok": True})
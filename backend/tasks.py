@@ -0,0 +1,116 @@
+# tasks.py — job types run by worker.py (see jobs.py)
+import os
+
+from jobs import register, JobError
+from db import get_conn, fetch_all
+from queries import named_query
+from src.routes.employees import BATCH_MAX, parse_employee_items, upsert_employees
+from src.routes.payslips import build_payslip_pdf, rendered_pdf_path
+
+# employees per "employees.import" job; the payload is kept in jobs.payload until it finishes
+IMPORT_MAX = int(os.getenv("EMPLOYEE_IMPORT_MAX", "10000"))
+# payslips per "payslips.render" job
+RENDER_MAX = int(os.getenv("PAYSLIP_RENDER_MAX", "10000"))
+
+
+PAYSLIPS_FOR_RENDER_SQL = named_query(
+    "tasks.payslips_for_render",
+    """
+    SELECT p.id,
+           e.id                              AS employee_id,
+           COALESCE(e.full_name, e.name, u.email) AS employee_name,
+           to_char(p.period_start, 'YYYY-MM-DD')  AS ps,
+           to_char(p.period_end,   'YYYY-MM-DD')  AS pe,
+           p.gross, p.net
+    FROM payslips p
+    JOIN employees e ON e.id = p.employee_id
+    JOIN users     u ON u.id = e.user_id
+    WHERE p.id = ANY(%s)
+    """,
+    params=([41, 42, 43],),
+)
+
+
+def _validate_render(payload):
+    """Runs at enqueue time: ids must be a non-empty list of integers."""
+    ids = payload.get("ids")
+    if not isinstance(ids, list) or not ids:
+        raise ValueError("ids must be a non-empty array")
+    if len(ids) > RENDER_MAX:
+        raise ValueError(f"at most {RENDER_MAX} payslips per render job")
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError("ids must be integers")
+
+
+@register("payslips.render", concurrency=4, validate=_validate_render)
+def render_payslips(payload, progress):
+    """
+    payload: {"ids": [payslip ids]}
+    Writes each PDF to PAYSLIP_STORAGE so GET /api/payslips/<id>/pdf serves it
+    from disk, replacing any earlier version of that payslip's file.
+    """
+    try:
+        _validate_render(payload)
+    except ValueError as e:
+        raise JobError(str(e))
+    ids = payload["ids"]
+    rows = fetch_all(PAYSLIPS_FOR_RENDER_SQL, (ids,))
+    rendered = []
+    for n, r in enumerate(rows, start=1):
+        data, mimetype, _name = build_payslip_pdf(r["id"], r["employee_name"], r["ps"], r["pe"], r["gross"], r["net"])
+        if mimetype != "application/pdf":
+            raise JobError("reportlab is not installed; cannot render PDFs")
+        path = rendered_pdf_path(r)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        for old in path.parent.glob(f"{r['id']}-*.pdf"):
+            if old != path:
+                old.unlink(missing_ok=True)
+        rendered.append(r["id"])
+        progress(n, len(rows))
+    return {"rendered": rendered, "missing": sorted(set(ids) - set(rendered))}
+
+
+def _validate_import(payload):
+    """
+    Runs at enqueue time. Payloads are stored in jobs.payload until the job
+    finishes, so they must not carry passwords: imported users get an
+    unusable password and set their own (or a manager sets it via PATCH).
+    """
+    employees = payload.get("employees")
+    if not isinstance(employees, list) or not employees:
+        raise ValueError("employees must be a non-empty array")
+    if len(employees) > IMPORT_MAX:
+        raise ValueError(f"at most {IMPORT_MAX} employees per import")
+    if any(isinstance(e, dict) and "password" in e for e in employees):
+        raise ValueError("passwords can't be imported; set them with PATCH /api/employees")
+    _items, errors = parse_employee_items(employees, partial=False)
+    if errors:
+        raise ValueError(f"invalid employees: {errors[:10]}")
+
+
+@register("employees.import", concurrency=1, validate=_validate_import)
+def import_employees(payload, progress):
+    """
+    payload: {"employees": [{name, email, rate}...]}
+    Same upsert as POST /api/employees, committed in BATCH_MAX-sized chunks.
+    A retry re-upserts every chunk, which is safe because the upsert is idempotent.
+    """
+    items, errors = parse_employee_items(payload.get("employees") or [], partial=False)
+    if errors:
+        raise JobError(f"invalid payload: {errors[:10]}")
+    if any(it["password"] for it in items):
+        raise JobError("passwords can't be imported")
+    total = len(items)
+    done = imported = 0
+    conflicts = []
+    for start in range(0, total, BATCH_MAX):
+        chunk = items[start:start + BATCH_MAX]
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                body, _status = upsert_employees(cur, chunk)
+        imported += len(body["employees"])
+        conflicts += body["conflicts"]
+        done += len(chunk)
+        progress(done, total)
+    return {"imported": imported, "conflicts": conflicts}
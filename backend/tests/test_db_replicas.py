@@ -0,0 +1,169 @@
+# tests/test_db_replicas.py — replica routing without a database (psycopg2.connect is stubbed)
+from collections import OrderedDict
+
+import psycopg2
+import pytest
+
+import db
+
+PRIMARY = "postgresql://p@primary/x"
+R1 = "postgresql://r@one/x"
+R2 = "postgresql://r@two/x"
+
+
+class FakeConn:
+    def __init__(self, dsn):
+        self.dsn = dsn
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, *args):
+        pass
+
+    def fetchone(self):
+        return self.dsn
+
+    def fetchall(self):
+        return [self.dsn]
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def env(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", PRIMARY)
+    monkeypatch.setenv("DATABASE_REPLICA_URLS", f"{R1},{R2}")
+    monkeypatch.setattr(db, "_rr_index", 0)
+    monkeypatch.setattr(db, "_replica_down_until", {})
+    monkeypatch.setattr(db, "_last_write_at", OrderedDict())
+    clock = Clock()
+    monkeypatch.setattr(db.time, "monotonic", clock)
+
+    down = set()
+    calls = []
+
+    def connect(dsn, **kwargs):
+        calls.append((dsn, kwargs))
+        if dsn in down:
+            raise psycopg2.OperationalError("unreachable")
+        return FakeConn(dsn)
+
+    monkeypatch.setattr(db.psycopg2, "connect", connect)
+    return {"down": down, "calls": calls, "clock": clock}
+
+
+def test_replica_candidates_round_robin(env):
+    assert db._replica_candidates([R1, R2]) == [R1, R2]
+    assert db._replica_candidates([R1, R2]) == [R2, R1]
+    assert db._replica_candidates([R1, R2]) == [R1, R2]
+
+
+def test_replica_candidates_skip_down_until_retry(env):
+    db._replica_down_until[R1] = env["clock"].now + 30
+    assert db._replica_candidates([R1, R2]) == [R2]
+    env["clock"].now += 31
+    assert db._replica_candidates([R1, R2]) == [R2, R1]
+
+
+def test_failed_replica_is_marked_down_and_read_fails_over(env):
+    env["down"].add(R1)
+    assert db.fetch_one("select 1", readonly=True) == R2
+    assert db._replica_down_until[R1] == env["clock"].now + db.REPLICA_RETRY_SECONDS
+
+
+def test_all_replicas_down_reads_primary(env):
+    env["down"].update({R1, R2})
+    assert db.fetch_one("select 1", readonly=True) == PRIMARY
+
+
+def test_replica_connect_uses_timeout(env):
+    db.fetch_one("select 1", readonly=True)
+    dsn, kwargs = env["calls"][0]
+    assert dsn == R1
+    assert kwargs["connect_timeout"] == db.REPLICA_CONNECT_TIMEOUT
+
+
+def test_read_only_handler_pins_one_replica(env):
+    @db.read_only
+    def handler():
+        return [db.fetch_one("select 1"), db.fetch_all("select 2")[0], db.fetch_one("select 3")]
+
+    assert handler() == [R1, R1, R1]
+    assert handler() == [R2, R2, R2]
+
+
+def test_pinned_replica_lost_mid_request_falls_back_to_primary(env):
+    @db.read_only
+    def handler():
+        first = db.fetch_one("select 1")
+        env["down"].add(R1)
+        return [first, db.fetch_one("select 2"), db.fetch_one("select 3")]
+
+    assert handler() == [R1, PRIMARY, PRIMARY]
+
+
+def test_writes_go_to_primary_outside_read_only(env):
+    assert db.fetch_one("select 1") == PRIMARY
+
+
+def test_primary_reads_do_not_make_the_user_sticky(env):
+    token = db.set_sticky_key(7)
+    try:
+        db.fetch_one("select 1")
+        assert not db._recently_wrote()
+        assert db.fetch_one("select 1", readonly=True) == R1
+    finally:
+        db.reset_sticky_key(token)
+
+
+def test_recently_wrote_expires(env):
+    token = db.set_sticky_key(7)
+    try:
+        assert not db._recently_wrote()
+        db.execute("update t set x = 1")
+        assert db._recently_wrote()
+        assert db.fetch_one("select 1", readonly=True) == PRIMARY
+
+        env["clock"].now += db.READ_YOUR_WRITES_SECONDS + 1
+        assert not db._recently_wrote()
+        assert 7 not in db._last_write_at
+        assert db.fetch_one("select 1", readonly=True) == R1
+    finally:
+        db.reset_sticky_key(token)
+
+
+def test_sticky_map_is_bounded_and_pruned(env, monkeypatch):
+    monkeypatch.setattr(db, "STICKY_MAX_USERS", 3)
+    for uid in range(5):
+        token = db.set_sticky_key(uid)
+        db.note_write()
+        db.reset_sticky_key(token)
+    assert list(db._last_write_at) == [2, 3, 4]
+
+    env["clock"].now += db.READ_YOUR_WRITES_SECONDS + 1
+    token = db.set_sticky_key(99)
+    db.note_write()
+    db.reset_sticky_key(token)
+    assert list(db._last_write_at) == [99]
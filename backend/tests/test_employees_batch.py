@@ -0,0 +1,182 @@
+# Batched upsert/update and Idempotency-Key handling against a stub cursor (no database needed).
+import hashlib
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask, request
+
+from src.routes import employees
+from src.routes.employees import parse_employee_items, upsert_employees
+
+
+class FakeCursor:
+    """
+    Answers each statement with the rows of the first (needle, answer) pair
+    whose needle appears in the SQL; answer may be a list of rows or
+    answer(params, values) for execute_values statements.
+    """
+    connection = SimpleNamespace(encoding="UTF8")
+
+    def __init__(self, *answers):
+        self.answers = answers
+        self.calls = []      # (normalised sql, params, execute_values rows)
+        self._values = []
+        self._rows = []
+
+    def mogrify(self, template, args):
+        self._values.append(tuple(args))
+        return b"(?)"
+
+    def execute(self, query, params=None):
+        text = " ".join((query.decode() if isinstance(query, bytes) else query).split())
+        values, self._values = self._values, []
+        self.calls.append((text, params, values))
+        rows = []
+        for needle, answer in self.answers:
+            if needle in text:
+                rows = answer(params, values) if callable(answer) else answer
+                break
+        self._rows = list(rows)
+        self.rowcount = len(self._rows)
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def ran(self, needle):
+        return [c for c in self.calls if needle in c[0]]
+
+
+def _items(*raw, partial=False):
+    items, errors = parse_employee_items(list(raw), partial=partial)
+    assert errors == []
+    for it in items:
+        if it["password"]:
+            it["password_hash"] = "hashed:" + it["password"]
+    return items
+
+
+def _emp_rows(params, values):
+    return [{"id": 100 + n, "name": v[-3], "email": v[-2], "rate": v[-1]}
+            for n, v in enumerate(values)]
+
+
+def test_upsert_reports_users_linked_elsewhere_per_row_and_sorts_conflicts():
+    cur = FakeCursor(
+        ("FROM users WHERE lower(email)", [
+            {"id": 2, "key": "moved@x.io", "role": "employee"},
+            {"id": 3, "key": "orphan@x.io", "role": "employee"},
+        ]),
+        # orphan@x.io matches an unlinked employee; user 3 already owns another one
+        ("FROM employees WHERE lower(email)", [{"id": 30, "user_id": None, "key": "orphan@x.io"}]),
+        # user 2 owns employee 20 filed under a different email
+        ("FROM employees WHERE user_id", [{"id": 20, "user_id": 2}, {"id": 31, "user_id": 3}]),
+        ("INSERT INTO users", lambda p, v: [{"id": 9, "key": "new@x.io"}]),
+        ("INSERT INTO employees", _emp_rows),
+    )
+    items = _items(
+        {"email": "race@x.io", "name": "Race"},
+        {"email": "moved@x.io", "name": "Moved", "rate": 30},
+        {"email": "new@x.io", "name": "New"},
+        {"email": "orphan@x.io", "name": "Orphan"},
+    )
+    body, status = upsert_employees(cur, items)
+
+    assert status == 201
+    assert body["conflicts"] == [
+        {"index": 0, "email": "race@x.io", "error": "user was created by a concurrent request; retry"},
+        {"index": 1, "email": "moved@x.io", "error": "user already linked to a different employee"},
+        {"index": 3, "email": "orphan@x.io", "error": "user already linked to a different employee"},
+    ]
+    assert [e["email"] for e in body["employees"]] == ["new@x.io"]
+    # neither existing employee row was touched
+    assert cur.ran("UPDATE employees") == []
+    assert cur.ran("INSERT INTO employees")[0][2] == [(9, "New", "new@x.io", 0)]
+
+
+def test_upsert_keeps_the_stored_rate_when_omitted():
+    cur = FakeCursor(
+        ("FROM users WHERE lower(email)", [{"id": 2, "key": "ada@x.io", "role": "employee"}]),
+        ("FROM employees WHERE lower(email)", [{"id": 20, "user_id": 2, "key": "ada@x.io"}]),
+        ("FROM employees WHERE user_id", [{"id": 20, "user_id": 2}]),
+        ("UPDATE employees e", _emp_rows),
+    )
+    body, status = upsert_employees(cur, _items({"email": "ada@x.io", "name": "Ada"}))
+
+    assert status == 201 and body["conflicts"] == []
+    sql, _params, values = cur.ran("UPDATE employees e")[0]
+    assert "COALESCE(v.rate, e.rate)" in sql
+    assert values == [(20, 2, "Ada", "ada@x.io", None)]
+
+
+def test_upsert_with_every_row_in_conflict_is_409():
+    cur = FakeCursor(
+        ("FROM users WHERE lower(email)", [{"id": 2, "key": "a@x.io", "role": "employee"},
+                                          {"id": 3, "key": "a@x.io", "role": "employee"}]),
+    )
+    body, status = upsert_employees(cur, _items({"email": "a@x.io", "name": "A"}))
+    assert status == 409
+    assert body == {"employees": [], "conflicts": [
+        {"index": 0, "email": "a@x.io", "error": "email matches more than one account"},
+    ]}
+
+
+def test_update_reports_conflicts_in_request_order():
+    cur = FakeCursor(
+        ("FROM employees WHERE lower(email)", [
+            {"id": 10, "user_id": None, "key": "nologin@x.io"},
+            {"id": 11, "user_id": 5, "key": "twice@x.io"},
+            {"id": 12, "user_id": 6, "key": "twice@x.io"},
+        ]),
+        ("WHERE lower(e.email) = v.email", [
+            {"id": 10, "user_id": None, "name": "N", "email": "nologin@x.io", "rate": 1, "key": "nologin@x.io"},
+        ]),
+    )
+    items = _items(
+        {"email": "nologin@x.io", "password": "pw"},
+        {"email": "twice@x.io", "rate": 5},
+        {"email": "missing@x.io"},
+        partial=True,
+    )
+    body, status = employees._update_employees(cur, items)
+
+    assert status == 200
+    assert body["conflicts"] == [
+        {"index": 0, "email": "nologin@x.io", "error": "employee has no login; password not set"},
+        {"index": 1, "email": "twice@x.io", "error": "email matches more than one employee"},
+    ]
+    assert body["notFound"] == ["missing@x.io"]
+    assert cur.ran("UPDATE users") == []
+
+
+def test_replay_requires_the_same_body():
+    prev = {"request_hash": "abc", "status_code": 201, "response": {"id": 1}}
+    assert employees._replay(prev, "abc") == ({"id": 1}, 201)
+    assert employees._replay(prev, "other") == ({"error": "idempotency_key_reused"}, 422)
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    """A finished request for Idempotency-Key k1; the handler and the database must not run again."""
+    body = b'[{"email": "a@x.io", "name": "A"}]'
+    monkeypatch.setattr(employees, "fetch_one", lambda sql, params, readonly=None: {
+        "request_hash": hashlib.sha256(body).hexdigest(), "status_code": 201, "response": {"employees": []},
+    })
+    monkeypatch.setattr(employees, "hash_passwords", lambda items: pytest.fail("hashed again"))
+    monkeypatch.setattr(employees, "get_conn", lambda: pytest.fail("opened a transaction"))
+    return body
+
+
+@pytest.mark.parametrize("sent, expected", [
+    ("same", ({"employees": []}, 201)),
+    (b'[{"email": "b@x.io", "name": "B"}]', ({"error": "idempotency_key_reused"}, 422)),
+])
+def test_idempotent_replays_stored_response_without_running_handler(stored, sent, expected):
+    data = stored if sent == "same" else sent
+    app = Flask(__name__)
+    with app.test_request_context("/", method="POST", data=data, headers={"Idempotency-Key": "k1"}):
+        request.user = {"id": 1, "email": "boss@x.io", "role": "manager"}
+        resp, status = employees._idempotent(lambda cur, items: pytest.fail("handler ran"), [])
+        assert (resp.get_json(), status) == expected
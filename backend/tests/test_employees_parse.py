@@ -0,0 +1,73 @@
+# Validation for the batched POST/PATCH /api/employees payloads (no database needed).
+from decimal import Decimal
+
+import pytest
+
+from src.routes.employees import RATE_MAX, parse_employee_items
+
+
+def _one(raw, partial=False):
+    return parse_employee_items([raw], partial=partial)
+
+
+def test_valid_item_is_normalised():
+    items, errors = _one({"email": "  Ada@Example.COM ", "name": " Ada ", "rate": "25.5", "password": "pw"})
+    assert errors == []
+    assert items == [{"index": 0, "email": "ada@example.com", "name": "Ada",
+                      "rate": Decimal("25.50"), "password": "pw"}]
+
+
+@pytest.mark.parametrize("field, value", [
+    ("email", 123), ("email", ["a@b.c"]), ("name", {"first": "Ada"}), ("password", 12345678), ("password", True),
+])
+def test_non_string_fields_are_rejected(field, value):
+    raw = {"email": "ada@example.com", "name": "Ada"}
+    raw[field] = value
+    items, errors = _one(raw)
+    assert items == []
+    assert errors == [{"index": 0, "error": f"{field} must be a string"}]
+
+
+@pytest.mark.parametrize("rate", [
+    "NaN", "Infinity", "-Infinity", float("nan"), float("inf"),
+    1e30, "1e30", "99999999.999", -1, "abc", True, [25], {"v": 1},
+])
+def test_unusable_rates_are_rejected(rate):
+    items, errors = _one({"email": "ada@example.com", "name": "Ada", "rate": rate})
+    assert items == []
+    assert errors[0]["index"] == 0
+    assert "rate" in errors[0]["error"]
+
+
+def test_rate_bounds_and_rounding():
+    items, errors = parse_employee_items([
+        {"email": "a@x.io", "name": "A", "rate": 0},
+        {"email": "b@x.io", "name": "B", "rate": str(RATE_MAX)},
+        {"email": "c@x.io", "name": "C", "rate": 19.999},
+        {"email": "d@x.io", "name": "D"},
+    ], partial=False)
+    assert errors == []
+    assert [it["rate"] for it in items] == [Decimal("0.00"), RATE_MAX, Decimal("20.00"), None]
+
+
+def test_duplicates_and_missing_fields_report_their_index():
+    items, errors = parse_employee_items([
+        {"email": "ada@example.com", "name": "Ada"},
+        {"email": "ADA@example.com", "name": "Ada again"},
+        {"name": "No email"},
+        {"email": "bob@example.com"},
+        "not an object",
+    ], partial=False)
+    assert [it["index"] for it in items] == [0]
+    assert errors == [
+        {"index": 1, "error": "duplicate email"},
+        {"index": 2, "error": "missing email"},
+        {"index": 3, "error": "missing name"},
+        {"index": 4, "error": "not an object"},
+    ]
+
+
+def test_partial_only_requires_email():
+    items, errors = _one({"email": "bob@example.com"}, partial=True)
+    assert errors == []
+    assert items == [{"index": 0, "email": "bob@example.com", "name": None, "rate": None, "password": None}]
@@ -0,0 +1,196 @@
+# Job queue logic against a stub cursor (jobs.get_conn is replaced; no database needed).
+from contextlib import contextmanager
+
+import pytest
+
+import jobs
+import tasks
+
+
+class FakeCursor:
+    """
+    Each statement gets the rows of the first (needle, answer) pair whose
+    needle appears in the SQL; answer is a list of rows or answer(params).
+    rowcount is the number of rows returned.
+    """
+    def __init__(self, *answers):
+        self.answers = answers
+        self.calls = []
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=None):
+        text = " ".join(query.split())
+        # copy list params: claim() narrows its type list between statements
+        self.calls.append((text, params and tuple(list(p) if isinstance(p, list) else p for p in params)))
+        rows = []
+        for needle, answer in self.answers:
+            if needle in text:
+                rows = answer(params) if callable(answer) else answer
+                break
+        self._rows = list(rows)
+        self.rowcount = len(self._rows)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def ran(self, needle):
+        return [c for c in self.calls if needle in c[0]]
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """Every get_conn() yields queue.cur; tests assign their own FakeCursor to it."""
+    state = type("Queue", (), {"cur": FakeCursor()})()
+
+    @contextmanager
+    def get_conn():
+        yield state.cur
+
+    monkeypatch.setattr(jobs, "get_conn", get_conn)
+    return state
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    """Registers test.job with a handler that returns or raises `outcome`."""
+    outcome = {}
+
+    def fn(payload, progress):
+        if isinstance(outcome.get("value"), Exception):
+            raise outcome["value"]
+        return outcome.get("value")
+
+    monkeypatch.setitem(jobs._handlers, "test.job", fn)
+    monkeypatch.setitem(jobs._concurrency, "test.job", None)
+    monkeypatch.setitem(jobs._validators, "test.job", None)
+    return outcome
+
+
+def _job(attempts=1, max_attempts=3):
+    return {"id": 7, "job_type": "test.job", "payload": {}, "attempts": attempts, "max_attempts": max_attempts}
+
+
+def test_backoff_doubles_from_base_and_is_capped(monkeypatch):
+    monkeypatch.setattr(jobs, "RETRY_BASE_SECONDS", 10.0)
+    monkeypatch.setattr(jobs, "RETRY_MAX_SECONDS", 100.0)
+    assert [jobs.backoff_seconds(n) for n in range(0, 6)] == [10, 10, 20, 40, 80, 100]
+    assert jobs.backoff_seconds(1000) == 100
+
+
+def test_enqueue_rejects_unknown_type():
+    with pytest.raises(ValueError, match="unknown job type"):
+        jobs.enqueue("no.such.job", {})
+
+
+@pytest.mark.parametrize("payload, message", [
+    ({}, "non-empty array"),
+    ({"employees": {"email": "a@x.io"}}, "non-empty array"),
+    ({"employees": [{"email": "a@x.io", "name": "A", "password": "secret"}]}, "passwords"),
+    ({"employees": [{"email": "a@x.io", "name": "A", "rate": "NaN"}]}, "invalid employees"),
+])
+def test_import_validator_rejects_before_anything_is_stored(monkeypatch, payload, message):
+    monkeypatch.setattr(jobs, "fetch_one", lambda *a, **k: pytest.fail("payload was stored"))
+    with pytest.raises(ValueError, match=message):
+        jobs.enqueue("employees.import", payload)
+
+
+def test_import_validator_caps_size(monkeypatch):
+    monkeypatch.setattr(tasks, "IMPORT_MAX", 2)
+    rows = [{"email": f"u{i}@x.io", "name": "U"} for i in range(3)]
+    with pytest.raises(ValueError, match="at most 2"):
+        tasks._validate_import({"employees": rows})
+    tasks._validate_import({"employees": rows[:2]})
+
+
+@pytest.mark.parametrize("value, attempts, status, needle", [
+    ({"ok": True}, 1, "done", "status = 'done'"),
+    (RuntimeError("flaky"), 1, "queued", "status = 'queued'"),
+    (RuntimeError("flaky"), 3, "failed", "status = 'failed'"),
+    (jobs.JobError("bad input"), 1, "failed", "status = 'failed'"),
+])
+def test_run_records_outcome_for_its_worker(queue, handler, value, attempts, status, needle):
+    handler["value"] = value
+    queue.cur = FakeCursor(("UPDATE jobs", [{}]))
+    assert jobs.run(_job(attempts=attempts), "w1") == status
+
+    (sql, params), = queue.cur.calls
+    assert needle in sql and "locked_by = %s" in sql
+    assert params[-2:] == (7, "w1")
+    if status == "queued":
+        assert params[1] == jobs.backoff_seconds(attempts)
+
+
+def test_run_reports_lost_when_another_worker_owns_the_job(queue, handler):
+    handler["value"] = {"ok": True}
+    queue.cur = FakeCursor(("UPDATE jobs", []))
+    assert jobs.run(_job(), "w1") == "lost"
+
+
+def test_claim_skips_types_at_their_concurrency_limit(queue, monkeypatch):
+    for t, limit in (("test.busy", 1), ("test.free", None)):
+        monkeypatch.setitem(jobs._handlers, t, lambda payload, progress: None)
+        monkeypatch.setitem(jobs._concurrency, t, limit)
+    due = [{"id": 1, "job_type": "test.busy"}, {"id": 2, "job_type": "test.free"}]
+    queue.cur = FakeCursor(
+        ("FOR UPDATE SKIP LOCKED", lambda params: [j for j in due if j["job_type"] in params[0]][:1]),
+        ("count(*)", [{"n": 1}]),
+        ("SET status = 'running'", lambda params: [{"id": params[1], "job_type": "test.free"}]),
+    )
+    job = jobs.claim("w1", ["test.busy", "test.free"])
+
+    assert job["id"] == 2
+    assert [p for _sql, p in queue.cur.ran("FOR UPDATE SKIP LOCKED")] == [
+        (["test.busy", "test.free"],), (["test.free"],),
+    ]
+    assert queue.cur.ran("SET status = 'running'")[0][1] == ("w1", 2)
+
+
+def test_claim_returns_none_when_every_type_is_saturated(queue, monkeypatch):
+    monkeypatch.setitem(jobs._handlers, "test.busy", lambda payload, progress: None)
+    monkeypatch.setitem(jobs._concurrency, "test.busy", 1)
+    queue.cur = FakeCursor(
+        ("FOR UPDATE SKIP LOCKED", [{"id": 1, "job_type": "test.busy"}]),
+        ("count(*)", [{"n": 1}]),
+    )
+    assert jobs.claim("w1", ["test.busy"]) is None
+    assert queue.cur.ran("SET status = 'running'") == []
+
+
+def test_requeue_stale_fails_exhausted_jobs_and_requeues_the_rest(queue):
+    queue.cur = FakeCursor(
+        ("SET status = 'failed'", [{}, {}]),
+        ("SET status = 'queued'", [{}, {}, {}]),
+    )
+    assert jobs.requeue_stale() == (3, 2)
+    (fail_sql, _), (requeue_sql, _) = queue.cur.calls
+    assert "attempts >= max_attempts" in fail_sql
+    assert "attempts < max_attempts" in requeue_sql
+
+
+@pytest.mark.parametrize("payload, message", [
+    ({}, "non-empty array"),
+    ({"ids": "123"}, "non-empty array"),
+    ({"ids": 5}, "non-empty array"),
+    ({"ids": ["x"]}, "integers"),
+    ({"ids": [1, True]}, "integers"),
+])
+def test_render_validator_rejects_non_integer_ids(monkeypatch, payload, message):
+    monkeypatch.setattr(jobs, "fetch_one", lambda *a, **k: pytest.fail("payload was stored"))
+    with pytest.raises(ValueError, match=message):
+        jobs.enqueue("payslips.render", payload)
+
+
+def test_render_validator_caps_size(monkeypatch):
+    monkeypatch.setattr(tasks, "RENDER_MAX", 2)
+    with pytest.raises(ValueError, match="at most 2"):
+        tasks._validate_render({"ids": [1, 2, 3]})
+    tasks._validate_render({"ids": [1, 2]})
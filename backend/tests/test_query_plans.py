@@ -0,0 +1,58 @@
+# query_plans.check() on hand-written EXPLAIN (FORMAT JSON) output; no database needed.
+from query_plans import check
+
+ROWS = {"timesheets": 1_000_000, "employees": 20_000, "users": 20_000, "settings": 10}
+
+
+def _q(**overrides):
+    q = {"name": "t.query", "sql": "", "params": (), "seq_scan_ok": (), "max_ms": 50.0, "max_buffers": 1000}
+    q.update(overrides)
+    return q
+
+
+def _plan(node, ms=1.0):
+    return {"Plan": node, "Execution Time": ms}
+
+
+def _scan(node_type, rel, hit=0, read=0, plans=()):
+    node = {"Node Type": node_type, "Relation Name": rel,
+            "Shared Hit Blocks": hit, "Shared Read Blocks": read}
+    if plans:
+        node["Plans"] = list(plans)
+    return node
+
+
+def test_index_lookup_within_budget_passes():
+    r = check(_q(), _plan(_scan("Index Scan", "users", hit=3)), ROWS, 10_000)
+    assert r["problems"] == []
+    assert r["seq_scans"] == []
+    assert r["buffers"] == 3
+
+
+def test_nested_seq_scan_on_large_table_is_reported():
+    plan = _plan({"Node Type": "Hash Join", "Shared Hit Blocks": 40, "Shared Read Blocks": 2, "Plans": [
+        _scan("Index Scan", "employees"),
+        {"Node Type": "Hash", "Plans": [_scan("Seq Scan", "timesheets")]},
+    ]})
+    r = check(_q(), plan, ROWS, 10_000)
+    assert r["seq_scans"] == ["timesheets"]
+    assert r["problems"] == ["seq scan on timesheets (1000000 rows)"]
+    assert r["buffers"] == 42
+
+
+def test_seq_scan_allowed_when_listed_or_table_is_small():
+    plan = _plan({"Node Type": "Nested Loop", "Plans": [
+        _scan("Seq Scan", "employees"), _scan("Seq Scan", "settings"),
+    ]})
+    r = check(_q(seq_scan_ok=("employees",)), plan, ROWS, 10_000)
+    assert r["seq_scans"] == ["employees", "settings"]
+    assert r["problems"] == []
+
+
+def test_time_and_buffer_budgets():
+    plan = _plan(_scan("Index Scan", "users", hit=900, read=200), ms=75.5)
+    r = check(_q(), plan, ROWS, 10_000)
+    assert r["problems"] == ["75.5 ms > 50.0 ms", "1100 buffers > 1000"]
+
+    r = check(_q(max_ms=None, max_buffers=None), plan, ROWS, 10_000)
+    assert r["problems"] == []
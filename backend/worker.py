@@ -0,0 +1,64 @@
+# worker.py — runs background jobs from the `jobs` table
+#
+#   python worker.py                      # one process per CPU, all job types
+#   python worker.py -p 4 -t payslips.render
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Ensure backend root (where db.py lives) is importable
+ROOT = Path(__file__).resolve().parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def _run(types, poll_seconds):
+    import jobs
+    import tasks  # noqa: F401  (registers job types)
+
+    stopping = []
+    # finish the current job, then exit
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+    jobs.work(types=types, poll_seconds=poll_seconds, stop=lambda: bool(stopping))
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="WageFlow background job worker")
+    parser.add_argument("-p", "--processes", type=int, default=os.cpu_count() or 1,
+                        help="worker processes to start (default: CPU count)")
+    parser.add_argument("-t", "--types", default="",
+                        help="comma-separated job types to take (default: all)")
+    parser.add_argument("--poll", type=float, default=1.0,
+                        help="seconds to sleep when the queue is empty")
+    args = parser.parse_args()
+    types = [t.strip() for t in args.types.split(",") if t.strip()] or None
+
+    if args.processes <= 1:
+        _run(types, args.poll)
+        return
+
+    procs = [multiprocessing.Process(target=_run, args=(types, args.poll), name=f"worker-{i}")
+             for i in range(args.processes)]
+    for p in procs:
+        p.start()
+    print(f"Started {len(procs)} workers (types: {', '.join(types) if types else 'all'})")
+
+    def forward(signum, _frame):
+        for p in procs:
+            if p.is_alive():
+                os.kill(p.pid, signum)
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for p in procs:
+        p.join()
+
+
+if __name__ == "__main__":
+    main()